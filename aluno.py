@@ -1,8 +1,9 @@
 # aluno.py - FIXED VERSION
 import streamlit as st
 import time
-from datetime import datetime
-from core import Game, PLAYER_ICONS, game_cache
+from core import (Game, GameResults, PLAYER_ICONS, game_cache, WAITING_ROOM_REFRESH_SECONDS,
+                  GAME_REFRESH_SECONDS)
+from ui import memo_by_version, build_players_grid_html
 from streamlit.components.v1 import html
 import os
 import uuid
@@ -53,7 +54,8 @@ class UnifiedSessionManager:
             keys_to_clear = [
                 'session_id', 'username', 'game_code', 'user_type',
                 'selected_icon', 'answer_time', 'show_ranking',
-                'last_activity', 'input_game_code', 'input_nickname'
+                'last_activity', 'input_game_code', 'input_nickname',
+                '_render_memo'
             ]
             for key in keys_to_clear:
                 if key in st.session_state:
@@ -186,6 +188,33 @@ silent_audio_script = """
 </script>
 """
 
+# ==================== LIVE FRAGMENTS ====================
+# Reexecutam só o próprio trecho a cada intervalo; mudança de status dispara um rerun completo
+@st.fragment(run_every=GAME_REFRESH_SECONDS)
+def watch_game_phase(game_code, phase):
+    """Sem UI e sem bloquear: recarrega a página quando o jogo muda de fase (início,
+    próxima pergunta, fechamento, fim). Entradas e respostas dos colegas não contam."""
+    if Game.get_phase(game_code) != phase:
+        st.rerun()
+
+@st.fragment(run_every=WAITING_ROOM_REFRESH_SECONDS)
+def render_waiting_room_live(game_code):
+    """Status de conexão e jogadores da sala de espera"""
+    current_game = Game.get_by_code(game_code)
+    if not current_game or current_game.status != "waiting":
+        st.rerun()
+
+    st.success(f"✅ Conectado - {len(current_game.players)} jogadores online")
+    st.subheader("Jogadores na sala:")
+    if not current_game.players:
+        st.info("Nenhum jogador entrou ainda.")
+    else:
+        players_html = memo_by_version(
+            f"waiting_players:{current_game.code}", current_game.state_version,
+            lambda: build_players_grid_html(current_game.players)
+        )
+        st.markdown(players_html, unsafe_allow_html=True)
+
 def get_current_game():
     """Obtém jogo atual com validação de sessão - FIXED: melhor error handling"""
     current_game_code = st.session_state.get("game_code")
@@ -377,7 +406,9 @@ def render_student_home():
 
             if current_game.status == "waiting":
                 try:
-                    added_successfully = current_game.add_player(nickname, selected_icon_value)
+                    added_successfully = current_game.add_player(
+                        nickname, selected_icon_value, session_manager.get_session_id()
+                    )
 
                     if added_successfully:
                         st.session_state.username = nickname
@@ -451,33 +482,10 @@ def render_waiting_room():
         st.header(f"🔒Código: {current_game.code}")
         st.write("🕢 Aguarde o professor iniciar o jogo...")
         
-        # Status de conexão
-        connection_status = st.empty()
-        connection_status.success(f"✅ Conectado - {len(current_game.players)} jogadores online")
-        
-        st.subheader("Jogadores na sala:")
-        players_container = st.container()
-        
-        with players_container:
-            if not current_game.players:
-                st.info("Nenhum jogador entrou ainda.")
-            else:
-                player_cols = st.columns(3)
-                players_list = list(current_game.players.items())
-                for i, (player_name, player_data) in enumerate(players_list):
-                    with player_cols[i % 3]:
-                        icon = player_data.get('icon', '❓') if isinstance(player_data, dict) else '❓'
-                        safe_name = html_module.escape(player_name)
-                        st.markdown(
-                            f"<div style='text-align:center; padding:10px; margin:5px; "
-                            f"background-color:#e0f7fa; border-radius:10px;'>"
-                            f"<span style='font-size:2rem;'>{icon}</span><br>{safe_name}</div>",
-                            unsafe_allow_html=True
-                        )
-
-    # Auto-refresh
-    time.sleep(2)
-    st.rerun()
+        # Status de conexão e jogadores: fragmento com auto-refresh próprio
+        render_waiting_room_live(current_game.code)
+        # Início do jogo chega pela checagem de fase, sem esperar o refresh da lista
+        watch_game_phase(current_game.code, current_game.phase)
 
 def render_game():
     if not validate_session():
@@ -501,32 +509,24 @@ def render_game():
         return
 
     player_name_session = st.session_state.username
-    player_data = current_game.players.get(player_name_session, {}) if isinstance(current_game.players, dict) else {}
-    player_answers = player_data.get("answers", []) if isinstance(player_data, dict) else []
-    
-    # Garantir que player_answers é uma lista
-    if not isinstance(player_answers, list):
-        player_answers = []
+    player = current_game.players.get(player_name_session)
 
     # Verificar se já respondeu a pergunta atual
-    already_answered = any(
-        isinstance(answer, dict) and answer.get("question") == current_game.current_question 
-        for answer in player_answers
-    )
+    already_answered = player is not None and player.answer_for(current_game.current_question) is not None
 
     # Mostrar ranking se solicitado
     if st.session_state.get("show_ranking", False): 
         st.markdown("<h1 class='title'>🏆 Ranking Parcial</h1>", unsafe_allow_html=True)
         
         try:
-            ranking = current_game.get_ranking()
+            ranking = current_game.get_ranking(10)
             col1, col2, col3 = st.columns([1, 2, 1])
             with col2:
                 # Tabela de ranking otimizada
                 table_html = "<div class='custom-ranking-table-container'><table class='custom-ranking-table'>"
                 table_html += "<thead><tr><th>Pos.</th><th>Jogador</th><th>Pontos</th><th>🔥</th></tr></thead><tbody>"
 
-                for i, player_rank_info in enumerate(ranking[:10]):
+                for i, player_rank_info in enumerate(ranking):
                     icon = player_rank_info.get('icon', '❓')
                     name = html_module.escape(player_rank_info.get('name', 'Unknown'))
                     score = player_rank_info.get('score', 0)
@@ -538,10 +538,7 @@ def render_game():
                 st.markdown(table_html, unsafe_allow_html=True)
                 
                 # Posição do jogador atual
-                player_position = next(
-                    (i+1 for i, p_rank in enumerate(ranking) if p_rank.get("name") == player_name_session), 
-                    None
-                )
+                player_position = current_game.get_player_rank(player_name_session)
                 if player_position:
                     st.markdown(
                         f"<p style='text-align:center; margin-top:20px;'>Sua posição: {player_position}º lugar</p>", 
@@ -572,8 +569,7 @@ def render_game():
     current_q_idx_game = current_game.current_question 
     if not (0 <= current_q_idx_game < len(current_game.questions)):
         st.error("Aguardando próxima pergunta...")
-        time.sleep(5)
-        st.rerun()
+        watch_game_phase(current_game.code, current_game.phase)
         return
 
     # Interface da pergunta
@@ -590,27 +586,23 @@ def render_game():
     
     question_text = current_game.questions[current_q_idx_game]['question']
     st.markdown(f"<div class='question-text'>{question_text}</div>", unsafe_allow_html=True)
-    
+
+    # Fechamento, próxima pergunta e fim do jogo chegam pelo fragmento watch_game_phase,
+    # que só compara a fase publicada (respostas dos colegas não reexecutam a página)
     if not already_answered:
-        # Timer baseado no servidor (question_start_time do professor)
+        # Timer baseado no servidor (prazo da pergunta em epoch ms)
         game_time_limit = current_game.time_limit
-        server_elapsed = 0.0
-        if current_game.question_start_time:
-            try:
-                q_start = datetime.fromisoformat(current_game.question_start_time)
-                server_elapsed = (datetime.now() - q_start).total_seconds()
-            except (ValueError, TypeError):
-                pass
 
         # Se tempo do servidor já expirou, bloquear resposta
-        if server_elapsed >= game_time_limit:
+        if current_game.question_closed or current_game.is_expired():
             st.warning("⏱ Tempo esgotado! Você não pode mais responder esta pergunta.")
-            time.sleep(2)
-            st.rerun()
+            watch_game_phase(current_game.code, current_game.phase)
             return
 
-        elapsed_ms = int(server_elapsed * 1000)
+        watch_game_phase(current_game.code, current_game.phase)
+
         limit_ms = game_time_limit * 1000
+        elapsed_ms = limit_ms - current_game.remaining_ms()
         timer_js = f"""
         <div id="kahoot-timer" style="text-align:center;margin-bottom:10px;">
             <span id="timer-text" style="font-size:1.3rem;font-weight:bold;color:#4CAF50;">⏱ {game_time_limit}s</span>
@@ -781,8 +773,7 @@ def render_game():
             st.rerun()
     else:
         st.info("✅ Você já respondeu esta pergunta. Aguarde a próxima.")
-        time.sleep(2)
-        st.rerun()
+        watch_game_phase(current_game.code, current_game.phase)
 
 def render_game_results():
     if not validate_session():
@@ -795,7 +786,8 @@ def render_game_results():
         st.rerun()
         return
 
-    current_game_results = get_current_game()
+    # Resultado calculado uma vez quando o jogo terminou (game_results), não o jogo ao vivo
+    current_game_results = resilient_game_operation(lambda: GameResults.get_by_code(current_game_code))
     if not current_game_results:
         st.error("Jogo não encontrado!")
         navigate_to("home")
@@ -805,12 +797,9 @@ def render_game_results():
     st.markdown("<h1 class='title' style='text-align: center; margin-bottom: 20px;'>🏆 Resultados Finais</h1>", unsafe_allow_html=True)
     
     try:
-        ranking = current_game_results.get_ranking()
+        ranking = current_game_results.ranking
         player_name_for_results = st.session_state.get("username")
-        player_position = next(
-            (i+1 for i, p_res in enumerate(ranking) if p_res.get("name") == player_name_for_results), 
-            None
-        )
+        player_position = current_game_results.rank_of(player_name_for_results)
 
         st.markdown(_RESULTS_CSS, unsafe_allow_html=True)
 
@@ -822,6 +811,14 @@ def render_game_results():
                 f"Parabéns, {safe_player_name}! Você ficou em {player_position}º lugar!</p>",
                 unsafe_allow_html=True
             )
+            summary = current_game_results.player_summaries[player_name_for_results]
+            avg_time = f" · tempo médio {summary['avg_time_ms'] / 1000:.1f}s" if summary["avg_time_ms"] is not None else ""
+            st.markdown(
+                f"<p style='text-align:center; color:#555; margin-bottom: 10px;'>"
+                f"{summary['correct']} de {len(current_game_results.question_stats)} acertos{avg_time}"
+                f" · melhor sequência {summary['best_streak']}</p>",
+                unsafe_allow_html=True
+            )
             
             if "balloons_shown" not in st.session_state: 
                 st.session_state.balloons_shown = False
@@ -903,6 +900,15 @@ def render_game_results():
         table_html_ranking += "</tbody></table></div>"
         st.markdown(table_html_ranking, unsafe_allow_html=True)
 
+        # Desempenho por pergunta (professor)
+        if st.session_state.user_type == "teacher" and current_game_results.question_stats:
+            lines = []
+            for q_idx, stats in enumerate(current_game_results.question_stats):
+                rate = stats["correct"] / stats["answered"] * 100 if stats["answered"] else 0
+                median = f" · mediana {stats['median_time_ms'] / 1000:.1f}s" if stats["median_time_ms"] is not None else ""
+                lines.append(f"- **Pergunta {q_idx + 1}:** {stats['correct']}/{stats['answered']} acertos ({rate:.0f}%){median}")
+            st.markdown("**📊 Desempenho por pergunta**\n\n" + "\n".join(lines))
+
     except Exception as e:
         logger.error(f"Error loading results: {e}")
         st.error("Erro ao carregar resultados. Atualizando...")
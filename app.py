@@ -1,8 +1,11 @@
 # app.py - FIXED VERSION
 import streamlit as st
 from streamlit.components.v1 import html
-from core import setup_data_directory, db_circuit_breaker
-from professor import render_teacher_login, render_teacher_dashboard, render_teacher_game_control, render_teacher_signup, render_upload_questions_json_page
+from core import (setup_data_directory, db_circuit_breaker, answer_writer, game_cache, teacher_cache,
+                  results_cache, dedup_cache, game_event_bus, game_actors, question_scheduler, db_pool,
+                  db_read_pool, db_shards, write_transaction_stats, game_write_stats,
+                  STORAGE_BACKEND)
+from professor import render_teacher_login, render_teacher_dashboard, render_teacher_game_control, render_teacher_signup, render_upload_questions_json_page, professor_local_cache
 from aluno import render_student_home, render_waiting_room, render_game, render_game_results
 from dotenv import load_dotenv
 import time
@@ -69,10 +72,28 @@ class AdvancedHealthCheck:
                 'status': self._system_status,
                 'metrics': {
                     'avg_db_latency_ms': round(avg_latency, 2),
-                    'cache_hit_rate': self.metrics['cache_hit_rate'],
+                    'cache_hit_rate': game_cache.get_stats()['hit_rate'],
                     'circuit_breaker_state': self.metrics['circuit_breaker_state'],
                     'error_rate_percent': round(error_rate, 2),
-                    'total_requests': self.metrics['total_requests']
+                    'total_requests': self.metrics['total_requests'],
+                    'circuit_breaker': db_circuit_breaker.get_metrics(),
+                    'storage_backend': STORAGE_BACKEND,
+                    'db_pool': db_pool.get_metrics(),
+                    'db_read_pool': db_read_pool.get_metrics(),
+                    'db_shards': db_shards.get_metrics(),
+                    'write_transactions': write_transaction_stats.get_metrics(),
+                    'game_writes': game_write_stats.get_metrics(),
+                    'answer_writer': answer_writer.get_metrics(),
+                    'game_event_bus': game_event_bus.get_metrics(),
+                    'game_actors': game_actors.get_metrics(),
+                    'question_scheduler': question_scheduler.get_metrics(),
+                    'caches': {
+                        'game': game_cache.get_stats(),
+                        'teacher': teacher_cache.get_stats(),
+                        'results': results_cache.get_stats(),
+                        'dedup': dedup_cache.get_stats(),
+                        'professor_local': professor_local_cache.get_stats()
+                    }
                 },
                 'timestamp': datetime.now().isoformat()
             }
@@ -80,13 +101,10 @@ class AdvancedHealthCheck:
     def _check_system_health(self):
         """Verifica saúde do sistema"""
         try:
-            from core import get_db_connection
+            from core import game_store
             
             start_time = time.time()
-            with get_db_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT 1")
-                cursor.fetchone()
+            game_store.ping()
             
             # Registrar latência
             latency_ms = (time.time() - start_time) * 1000
@@ -94,9 +112,11 @@ class AdvancedHealthCheck:
             
             # Atualizar estado do circuit breaker
             self.metrics['circuit_breaker_state'] = db_circuit_breaker.state.value
+            self.metrics['cache_hit_rate'] = game_cache.get_stats()['hit_rate']
+            self.metrics['active_connections'] = db_pool.get_metrics()['in_use']
             
             # Determinar status baseado em métricas
-            if db_circuit_breaker.state.value == 'OPEN':
+            if db_circuit_breaker.state.value == 'open':
                 self._system_status = "degraded"
             elif latency_ms > 200:  # Latência alta
                 self._system_status = "degraded"
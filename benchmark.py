@@ -0,0 +1,548 @@
+# benchmark.py - Benchmarks de performance do core
+"""Benchmarks reproduzíveis da camada de dados (core.py).
+
+Cada benchmark roda em um diretório temporário com um banco SQLite descartável,
+nunca em data/database.db.
+
+Uso:
+    python benchmark.py circuit-breaker [--threads 16] [--calls 4000] [--io-latency-ms 2]
+    python benchmark.py answers [--players 50,500,2000] [--io-latency-ms 2]
+    python benchmark.py leaderboard [--ranking-players 1000] [--questions 50]
+    python benchmark.py stampede [--readers 200] [--rounds 20] [--io-latency-ms 2]
+    python benchmark.py latency [--players 50,500,2000] [--io-latency-ms 2]
+    python benchmark.py memory [--ranking-players 1000] [--questions 50]
+    python benchmark.py read-burst [--threads 16] [--io-latency-ms 2]
+    python benchmark.py shards [--games 20] [--game-players 30] [--shards 4] [--io-latency-ms 2]
+    python benchmark.py storage [--players 50,500,2000] [--io-latency-ms 2]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+# Banco descartável: core usa caminho relativo (data/database.db)
+_REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, _REPO_DIR)
+os.chdir(tempfile.mkdtemp(prefix="aryroot-bench-"))
+
+import logging
+logging.disable(logging.INFO)
+
+import core
+
+BENCH_QUESTIONS = [
+    {"question": f"Pergunta {i}", "options": ["A", "B", "C", "D"], "correct": i % 4}
+    for i in range(10)
+]
+
+# ==================== HELPERS ====================
+def create_game(code: str, players: int = 0, answered_questions: int = 0, status: str = "waiting") -> core.Game:
+    """Cria um jogo com jogadores e respostas já gravados"""
+    game = core.Game(code, "professor", questions_json_str=json.dumps(BENCH_QUESTIONS))
+    game.save()
+    for p in range(players):
+        game.add_player(f"p{p}", "😀")
+    if answered_questions:
+        core.game_store.persist_batch(code, [], [
+            (f"p{p}", core.AnswerRecord(question=q, answer=q % 4, correct=True, time_ms=1000, points=900, streak=q + 1))
+            for p in range(players) for q in range(answered_questions)
+        ], None)
+    game.status = status
+    game.save()
+    core.game_cache.clear()
+    return game
+
+def simulate_io_latency(latency_ms: float):
+    """Adiciona latência de armazenamento a cada get_db_connection.
+
+    Em máquinas com poucos núcleos e banco em page cache, as leituras são
+    puramente CPU-bound; a latência simulada (sleep libera o GIL, como I/O real
+    de disco/busy wait) torna visível quanto as chamadas se sobrepõem.
+    """
+    if latency_ms <= 0:
+        return
+    original = core.get_db_connection
+
+    @contextmanager
+    def slow_connection(*args, **kwargs):
+        with original(*args, **kwargs) as conn:
+            time.sleep(latency_ms / 1000.0)
+            yield conn
+
+    core.get_db_connection = slow_connection
+
+def run_parallel(func, items, threads: int) -> float:
+    """Executa func(item) em paralelo e retorna a duração em segundos"""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(func, items))
+    return time.perf_counter() - start
+
+def print_table(title: str, rows):
+    print(f"\n{title}")
+    width = max(len(r[0]) for r in rows)
+    for label, value in rows:
+        print(f"  {label:<{width}}  {value}")
+
+# ==================== CIRCUIT BREAKER ====================
+class SerializedCircuitBreaker(core.CircuitBreaker):
+    """Comportamento anterior: o lock do breaker é mantido durante toda a chamada"""
+
+    def call(self, func, *args, **kwargs):
+        with self._lock:
+            return super().call(func, *args, **kwargs)
+
+def bench_circuit_breaker(args):
+    codes = [f"CB{i:04d}" for i in range(64)]
+    for code in codes:
+        create_game(code, players=30, answered_questions=5)
+
+    def load(i):
+        code = codes[i % len(codes)]
+        core.game_cache.delete(f"game:{code}")
+        assert core.Game.get_by_code(code) is not None
+
+    rows = []
+    original = core.db_circuit_breaker
+    try:
+        for label, breaker in (("serializado (antes)", SerializedCircuitBreaker()),
+                               ("concorrente (depois)", core.CircuitBreaker())):
+            core.db_circuit_breaker = breaker
+            run_parallel(load, range(200), args.threads)  # aquecimento
+            elapsed = run_parallel(load, range(args.calls), args.threads)
+            rows.append((label, f"{args.calls / elapsed:8.0f} get_by_code/s  ({elapsed:.2f}s)"))
+    finally:
+        core.db_circuit_breaker = original
+
+    print_table(f"Circuit breaker - {args.calls} get_by_code sem cache, {args.threads} threads, "
+                f"I/O simulado {args.io_latency_ms}ms", rows)
+
+# ==================== ANSWERS (GROUP COMMIT) ====================
+def bench_answers(args):
+    player_counts = [int(n) for n in args.players.split(",")]
+    rows = []
+    original = core.GROUP_COMMIT_ENABLED
+    try:
+        for players in player_counts:
+            for label, group_commit in (("commit por resposta", False), ("group commit", True)):
+                core.GROUP_COMMIT_ENABLED = group_commit
+                code = f"AN{players}{int(group_commit)}"
+                game = create_game(code, players=players, status="active")
+
+                def answer(p):
+                    is_correct, _, _ = game.record_answer(f"p{p}", p % 4)
+                    assert is_correct is not None
+
+                # Todos os alunos respondem ao mesmo tempo (uma thread por aluno, até 256)
+                elapsed = run_parallel(answer, range(players), min(players, 256))
+                rows.append((f"{players:>5} jogadores, {label}",
+                             f"{players / elapsed:8.0f} respostas/s  ({elapsed:.2f}s)"))
+    finally:
+        core.GROUP_COMMIT_ENABLED = original
+
+    metrics = core.answer_writer.get_metrics()
+    rows.append(("lotes do writer", f"{metrics['batches']} (média {metrics['avg_batch_size']}, "
+                                    f"máx {metrics['max_batch_size']})"))
+    print_table(f"Respostas simultâneas a uma pergunta, I/O simulado {args.io_latency_ms}ms", rows)
+
+# ==================== LEADERBOARD ====================
+def legacy_get_ranking(game: core.Game):
+    """Implementação anterior: recalcula streaks e reordena todos os jogadores a cada chamada"""
+    ranking = []
+    for name, player in game.players.items():
+        current_streak = 0
+        for ans in reversed(sorted(player.answers, key=lambda a: a.question)):
+            if ans.correct:
+                current_streak += 1
+            else:
+                break
+        ranking.append({"name": name, "icon": player.icon, "score": player.score, "streak": current_streak})
+    return sorted(ranking, key=lambda x: x["score"], reverse=True)
+
+def time_per_call(func, repeat: int) -> float:
+    """Tempo médio por chamada em microssegundos"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+def bench_leaderboard(args):
+    rng = random.Random(42)
+    questions = [{"question": f"Q{i}", "options": ["A", "B", "C", "D"], "correct": 0}
+                 for i in range(args.questions)]
+    # Só em memória: o que se mede é o cálculo do ranking, não o banco
+    game = core.Game("LB0001", "professor", questions_json_str=json.dumps(questions))
+    game.players = {f"p{p}": core.PlayerSnapshot(icon="😀") for p in range(args.ranking_players)}
+    me = f"p{args.ranking_players // 2}"
+
+    # Uma publicação de snapshot por pergunta, como um lote do answer_writer
+    update_start = time.perf_counter()
+    for q in range(args.questions):
+        answers = {}
+        for p in range(args.ranking_players):
+            correct = rng.random() < 0.6
+            answers[f"p{p}"] = core.AnswerRecord(question=q, answer=0, correct=correct, time_ms=1000,
+                                                 points=rng.randint(500, 1500) if correct else 0, streak=0)
+        game._apply_answers(answers)
+    answers = args.questions * args.ranking_players
+    update_us = (time.perf_counter() - update_start) / answers * 1e6
+    core.game_cache.clear()
+
+    def legacy():
+        ranking = legacy_get_ranking(game)
+        return ranking[:10], next((i + 1 for i, r in enumerate(ranking) if r["name"] == me), None)
+
+    def incremental():
+        return game.get_ranking(10), game.get_player_rank(me)
+
+    assert legacy() == incremental()
+    legacy_us = time_per_call(legacy, 20)
+    incremental_us = time_per_call(incremental, 2000)
+    full_us = time_per_call(game.get_ranking, 200)
+    print_table(f"Ranking - {args.ranking_players} jogadores x {args.questions} perguntas", [
+        ("get_ranking anterior (top 10 + posição)", f"{legacy_us:10.1f} µs/chamada"),
+        ("leaderboard (top 10 + posição)", f"{incremental_us:10.1f} µs/chamada  ({legacy_us / incremental_us:.0f}x)"),
+        ("leaderboard (ranking completo)", f"{full_us:10.1f} µs/chamada"),
+        ("custo incremental por resposta", f"{update_us:10.1f} µs"),
+    ])
+
+# ==================== CACHE STAMPEDE ====================
+def legacy_get_by_code(code: str):
+    """Comportamento anterior: cada leitor que encontra o cache vazio faz o próprio SELECT"""
+    cached = core.game_cache.get(f"game:{code}")
+    if cached:
+        return cached
+    game = core.Game._load_by_code(code)
+    if game:
+        core.game_cache.set(f"game:{code}", game)
+    return game
+
+def bench_stampede(args):
+    code = "STMP01"
+    create_game(code, players=200, answered_questions=5, status="active")
+    loads = [0]
+    original_loader = core.Game._load_by_code
+
+    def counting_loader(code):
+        loads[0] += 1
+        return original_loader(code)
+
+    rows = []
+    core.Game._load_by_code = counting_loader
+    try:
+        for label, get in (("sem coalescing (antes)", legacy_get_by_code),
+                           ("single-flight (depois)", core.Game.get_by_code)):
+            loads[0] = 0
+            elapsed = 0.0
+            for _ in range(args.rounds):
+                # Expira a entrada de vez (além da janela stale): todos os leitores chegam num cache vazio
+                core.game_cache.delete(f"game:{code}")
+                elapsed += run_parallel(lambda _: get(code), range(args.readers), args.readers)
+            rows.append((label, f"{loads[0] / args.rounds:6.1f} SELECTs por expiração  "
+                                f"({elapsed / args.rounds * 1000:.1f} ms por rodada)"))
+    finally:
+        core.Game._load_by_code = original_loader
+
+    print_table(f"Cache stampede - {args.readers} leitores simultâneos, {args.rounds} expirações, "
+                f"I/O simulado {args.io_latency_ms}ms", rows)
+
+# ==================== ANSWER LATENCY (ACTOR) ====================
+class GameLock:
+    """Baseline: lock nomeado por jogo dentro do processo, como o antigo
+    DistributedLock de core.py (que o compare-and-swap substituiu)"""
+    _guard = threading.Lock()
+    _locks = {}
+
+    def __init__(self, key: str, timeout: float = 10):
+        with GameLock._guard:
+            self._lock = GameLock._locks.setdefault(key, threading.Lock())
+        self.key = key
+        self.timeout = timeout
+
+    def __enter__(self):
+        if not self._lock.acquire(timeout=self.timeout):
+            raise TimeoutError(f"Failed to acquire lock: {self.key}")
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._lock.release()
+
+def locked_record_answer(game: core.Game, player_name: str, answer_index: int):
+    """Caminho com lock por jogo: trava o jogo, recarrega do cache/banco, pontua e grava"""
+    with GameLock(f"game:{game.code}"):
+        current = core.Game.get_by_code(game.code)
+        q_idx = current.current_question
+        if not current._can_answer(player_name, q_idx):
+            return (None, 0, 0)
+        answer = current._score_answer(player_name, q_idx, answer_index, 1.0)
+        state_version, _ = current._insert_answer(player_name, answer)
+        if state_version is None:
+            return (None, 0, 0)
+        current._apply_answers({player_name: answer}, state_version)
+        return answer.result()
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def bench_latency(args):
+    player_counts = [int(n) for n in args.players.split(",")]
+    modes = (
+        ("lock por jogo", lambda game, p: locked_record_answer(game, f"p{p}", p % 4), False, False),
+        ("commit por resposta", lambda game, p: game.record_answer(f"p{p}", p % 4), False, False),
+        ("group commit", lambda game, p: game.record_answer(f"p{p}", p % 4), True, False),
+        ("actor", lambda game, p: game.record_answer(f"p{p}", p % 4), False, True),
+    )
+    rows = []
+    original = (core.GROUP_COMMIT_ENABLED, core.ACTOR_MODE_ENABLED)
+    try:
+        for players in player_counts:
+            for i, (label, answer, group_commit, actor_mode) in enumerate(modes):
+                core.GROUP_COMMIT_ENABLED, core.ACTOR_MODE_ENABLED = False, False
+                code = f"LT{players}{i}"
+                game = create_game(code, players=players, status="active")
+                core.GROUP_COMMIT_ENABLED, core.ACTOR_MODE_ENABLED = group_commit, actor_mode
+                latencies = []
+
+                def timed(p):
+                    start = time.perf_counter()
+                    assert answer(game, p)[0] is not None
+                    latencies.append((time.perf_counter() - start) * 1000)
+
+                # Todos os alunos respondem ao mesmo tempo (uma thread por aluno, até 256)
+                run_parallel(timed, range(players), min(players, 256))
+                rows.append((f"{players:>5} jogadores, {label}",
+                             f"p50 {percentile(latencies, 50):7.1f} ms   p99 {percentile(latencies, 99):7.1f} ms"))
+    finally:
+        core.GROUP_COMMIT_ENABLED, core.ACTOR_MODE_ENABLED = original
+
+    metrics = core.game_actors.get_metrics()
+    rows.append(("lotes dos actors", f"{metrics['batches']} (média {metrics['avg_batch_size']}, "
+                                     f"máx {metrics['max_batch_size']})"))
+    print_table(f"Latência de record_answer com todos respondendo juntos, I/O simulado {args.io_latency_ms}ms", rows)
+
+# ==================== MEMORY ====================
+def traced_bytes(build):
+    """Bytes alocados (tracemalloc) pela estrutura que build() retorna, mantida viva"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    value = build()
+    allocated = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return value, allocated
+
+def bench_memory(args):
+    rng = random.Random(42)
+    players, questions = args.ranking_players, args.questions
+    # Formato JSON legado (o antigo blob games.players): um dict por jogador e por resposta
+    legacy_json = json.dumps({
+        f"p{p}": {
+            "icon": "😀", "score": 0, "joined_at": "2025-01-01T10:00:00.000000",
+            "answers": [{"question": q, "answer": rng.randrange(4), "correct": rng.random() < 0.6,
+                         "time": round(rng.uniform(0.5, 20), 2), "points": rng.randint(0, 1500),
+                         "streak": rng.randrange(5), "timestamp": f"2025-01-01T10:{q % 60:02d}:{p % 60:02d}.123456"}
+                        for q in range(questions)]
+        } for p in range(players)
+    })
+
+    legacy, legacy_bytes = traced_bytes(lambda: json.loads(legacy_json))
+    compact, compact_bytes = traced_bytes(
+        lambda: {name: core.PlayerSnapshot.from_dict(data) for name, data in legacy.items()})
+
+    start = time.perf_counter()
+    restored = {name: player.to_dict() for name, player in compact.items()}
+    to_dict_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    {name: core.PlayerSnapshot.from_dict(data) for name, data in restored.items()}
+    from_dict_ms = (time.perf_counter() - start) * 1000
+    sample = next(iter(legacy))
+    assert restored[sample]["answers"][0]["time"] == legacy[sample]["answers"][0]["time"]
+
+    print_table(f"Memória - {players} jogadores x {questions} respostas (tracemalloc)", [
+        ("dicts (formato JSON)", f"{legacy_bytes / players:10.0f} bytes/jogador  "
+                                 f"({legacy_bytes / 2**20:.1f} MiB)"),
+        ("PlayerSnapshot/AnswerRecord (slots)", f"{compact_bytes / players:10.0f} bytes/jogador  "
+                                                f"({compact_bytes / 2**20:.1f} MiB, "
+                                                f"{legacy_bytes / compact_bytes:.1f}x menor)"),
+        ("por resposta", f"{legacy_bytes / players / questions:6.0f} -> "
+                         f"{compact_bytes / players / questions:.0f} bytes"),
+        ("to_dict / from_dict (jogo inteiro)", f"{to_dict_ms:.1f} ms / {from_dict_ms:.1f} ms"),
+    ])
+
+# ==================== READS DURING WRITE BURST ====================
+def bench_read_burst(args):
+    read_code, burst_code, players = "READ01", "BURST1", 200
+    create_game(read_code, players=30, answered_questions=3, status="active")
+    original = core.get_db_connection
+
+    def shared_pool(read_only=False, shard=None):
+        # Comportamento anterior: leituras no mesmo pool (e caminho de commit) das escritas
+        return original(shard=shard)
+
+    rows = []
+    try:
+        for i, (label, connection) in enumerate((("mesmo pool (antes)", shared_pool),
+                                                 ("somente leitura (depois)", original))):
+            code = f"{burst_code}{i}"
+            create_game(code, players=players, status="active")
+            core.get_db_connection = connection
+            done = [False]
+            latencies = []
+
+            def write(item):
+                p, q = item
+                answer = core.AnswerRecord(question=q, answer=p % 4, correct=True, time_ms=1000, points=900, streak=1)
+                with core.write_transaction("benchmark.answer") as conn:
+                    conn.execute(core._INSERT_ANSWER_SQL, core._answer_row(code, f"p{p}", answer))
+                    core._bump_state_version(conn, code)
+
+            def read(_):
+                # Polling sem cache: cada leitura vai ao SQLite, como um get_by_code com o cache expirado
+                while not done[0]:
+                    start = time.perf_counter()
+                    assert core.Game._load_by_code(read_code) is not None
+                    latencies.append((time.perf_counter() - start) * 1000)
+
+            with ThreadPoolExecutor(max_workers=args.threads) as readers:
+                futures = [readers.submit(read, r) for r in range(args.threads)]
+                try:
+                    # Rajada de respostas: uma transação por resposta, todas as threads escrevendo juntas
+                    elapsed = run_parallel(write, [(p, q) for q in range(len(BENCH_QUESTIONS)) for p in range(players)],
+                                           args.threads)
+                finally:
+                    done[0] = True
+                for future in futures:
+                    future.result()
+            rows.append((f"{label}",
+                         f"{len(latencies) / elapsed:7.0f} leituras/s  p50 {percentile(latencies, 50):6.1f} ms  "
+                         f"p99 {percentile(latencies, 99):6.1f} ms  "
+                         f"({players * len(BENCH_QUESTIONS) / elapsed:.0f} escritas/s)"))
+    finally:
+        core.get_db_connection = original
+
+    print_table(f"Leituras durante rajada de escritas - {args.threads} leitores + {args.threads} escritores, "
+                f"pool de {core.db_pool.max_connections}, I/O simulado {args.io_latency_ms}ms", rows)
+
+# ==================== SHARDS ====================
+def bench_shards(args):
+    players = args.game_players
+    original = (core.db_shards, core.write_transaction, core.GROUP_COMMIT_ENABLED)
+
+    @contextmanager
+    def slow_commit(site, shard=None):
+        # fsync do commit simulado com o lock de escrita do arquivo ainda preso
+        with original[1](site, shard) as conn:
+            yield conn
+            time.sleep(args.io_latency_ms / 1000.0)
+
+    rows = []
+    try:
+        core.write_transaction = slow_commit
+        for shard_count in (1, args.shards):
+            # Layout novo em outro diretório: cada modo começa com arquivos vazios
+            directory = tempfile.mkdtemp(prefix=f"shards{shard_count}-", dir=".")
+            core.db_shards = core.ShardRouter(os.path.join(directory, "database.db"), shard_count)
+            core.setup_data_directory()
+            for label, group_commit in (("commit por resposta", False), ("group commit", True)):
+                core.GROUP_COMMIT_ENABLED = False
+                games = [create_game(f"SH{shard_count}{int(group_commit)}{g:02d}", players=players, status="active")
+                         for g in range(args.games)]
+                core.GROUP_COMMIT_ENABLED = group_commit
+                latencies = []
+
+                def timed(item):
+                    game, p = item
+                    start = time.perf_counter()
+                    assert game.record_answer(f"p{p}", p % 4)[0] is not None
+                    latencies.append((time.perf_counter() - start) * 1000)
+
+                # Todas as turmas respondem ao mesmo tempo (uma thread por aluno, até 256)
+                items = [(game, p) for p in range(players) for game in games]
+                elapsed = run_parallel(timed, items, min(len(items), 256))
+                layout = "arquivo único" if shard_count == 1 else f"{shard_count} shards"
+                rows.append((f"{layout}, {label}",
+                             f"p50 {percentile(latencies, 50):7.1f} ms   p99 {percentile(latencies, 99):7.1f} ms   "
+                             f"({len(items) / elapsed:.0f} respostas/s)"))
+    finally:
+        core.db_shards, core.write_transaction, core.GROUP_COMMIT_ENABLED = original
+
+    print_table(f"Latência de record_answer com {args.games} jogos simultâneos x {players} jogadores, "
+                f"I/O simulado {args.io_latency_ms}ms (também no commit)", rows)
+
+# ==================== STORAGE BACKENDS ====================
+def bench_storage(args):
+    player_counts = [int(n) for n in args.players.split(",")]
+    original = (core.game_store, core.teacher_store, core.GROUP_COMMIT_ENABLED)
+    rows = []
+    try:
+        for backend, label in (("sqlite", "SQLite"), ("memory", "memória")):
+            core.game_store, core.teacher_store = core.create_stores(backend)
+            core.setup_data_directory()
+            for players in player_counts:
+                for mode, group_commit in (("commit por resposta", False), ("group commit", True)):
+                    core.GROUP_COMMIT_ENABLED = False
+                    game = create_game(f"ST{backend[0]}{players}{int(group_commit)}", players=players, status="active")
+                    core.GROUP_COMMIT_ENABLED = group_commit
+                    latencies = []
+
+                    def timed(p):
+                        start = time.perf_counter()
+                        assert game.record_answer(f"p{p}", p % 4)[0] is not None
+                        latencies.append((time.perf_counter() - start) * 1000)
+
+                    elapsed = run_parallel(timed, range(players), min(players, 256))
+                    rows.append((f"{label:<7} {players:>5} jogadores, {mode}",
+                                 f"p50 {percentile(latencies, 50):7.1f} ms   p99 {percentile(latencies, 99):7.1f} ms   "
+                                 f"({players / elapsed:.0f} respostas/s)"))
+    finally:
+        core.game_store, core.teacher_store, core.GROUP_COMMIT_ENABLED = original
+
+    print_table(f"record_answer por backend de armazenamento (todos respondendo juntos), "
+                f"I/O simulado {args.io_latency_ms}ms no SQLite", rows)
+
+# ==================== MAIN ====================
+BENCHMARKS = {
+    "answers": bench_answers,
+    "circuit-breaker": bench_circuit_breaker,
+    "latency": bench_latency,
+    "leaderboard": bench_leaderboard,
+    "memory": bench_memory,
+    "read-burst": bench_read_burst,
+    "shards": bench_shards,
+    "stampede": bench_stampede,
+    "storage": bench_storage,
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks do AryRoot")
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS) + ["all"])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--calls", type=int, default=4000)
+    parser.add_argument("--players", default="50,500,2000",
+                        help="número de jogadores simulados (lista separada por vírgula)")
+    parser.add_argument("--ranking-players", type=int, default=1000)
+    parser.add_argument("--questions", type=int, default=50)
+    parser.add_argument("--readers", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--games", type=int, default=20, help="jogos simultâneos (shards)")
+    parser.add_argument("--game-players", type=int, default=30, help="jogadores por jogo (shards)")
+    parser.add_argument("--shards", type=int, default=4, help="número de arquivos no modo com shards")
+    parser.add_argument("--io-latency-ms", type=float, default=2.0,
+                        help="latência de armazenamento simulada por conexão (0 desativa)")
+    args = parser.parse_args()
+
+    core.setup_data_directory()
+    simulate_io_latency(args.io_latency_ms)
+    names = sorted(BENCHMARKS) if args.benchmark == "all" else [args.benchmark]
+    for name in names:
+        BENCHMARKS[name](args)
+
+if __name__ == "__main__":
+    main()
@@ -3,18 +3,29 @@ import random
 import string
 import json
 import os
-from datetime import datetime, timedelta
+import sys
+from datetime import datetime
 import bcrypt
 from dotenv import load_dotenv
 import sqlite3
 import time
 import threading
-from typing import Dict, Optional, Any, List
+from typing import Dict, Optional, Any, List, Tuple
 import logging
 from functools import wraps
-import uuid
+import urllib.parse
+import itertools
+import bisect
+import heapq
+import glob
+import zlib
+import weakref
+from collections import OrderedDict, deque
 from enum import Enum
+from abc import ABC, abstractmethod
 from contextlib import contextmanager
+from dataclasses import dataclass, replace
+from concurrent.futures import Future, ThreadPoolExecutor
 
 # Configurar logging estruturado
 logging.basicConfig(
@@ -36,249 +47,769 @@ def _get_secret(key: str, default: str = "") -> str:
     except (FileNotFoundError, AttributeError):
         return os.getenv(key, default)
 
+# Intervalos (s) dos fragmentos com auto-refresh das páginas
+WAITING_ROOM_REFRESH_SECONDS = float(_get_secret("ARYROOT_WAITING_ROOM_REFRESH_S", "2"))
+# Checagem de fase do aluno (início, próxima pergunta, fechamento, fim): leitura em memória, sem banco
+GAME_REFRESH_SECONDS = float(_get_secret("ARYROOT_GAME_REFRESH_S", "1"))
+TEACHER_REFRESH_SECONDS = float(_get_secret("ARYROOT_TEACHER_REFRESH_S", "2"))
+
 # ==================== CIRCUIT BREAKER ====================
 class CircuitState(Enum):
     CLOSED = "closed"
     OPEN = "open"
     HALF_OPEN = "half_open"
 
+class CircuitBreakerOpenError(Exception):
+    """Chamada rejeitada sem executar porque o circuito está aberto"""
+
 class CircuitBreaker:
-    """Circuit Breaker com 3 estados para prevenir cascading failures"""
+    """Circuit Breaker com 3 estados para prevenir cascading failures.
+    Só as checagens/transições de estado usam o lock; a chamada protegida roda em paralelo."""
     
-    def __init__(self, failure_threshold: int = 5, recovery_timeout: int = 30):
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: int = 30, half_open_max_calls: int = 1):
         self.failure_threshold = failure_threshold
         self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
         self.failure_count = 0
         self.last_failure_time = None
         self.state = CircuitState.CLOSED
+        self._half_open_in_flight = 0
         self._lock = threading.RLock()
+        self._counters = {'calls': 0, 'successes': 0, 'failures': 0, 'rejections': 0}
     
     def call(self, func, *args, **kwargs):
+        is_probe = self._before_call()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            self._on_failure(is_probe)
+            raise
+        self._on_success(is_probe)
+        return result
+
+    def get_metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'state': self.state.value, 'failure_count': self.failure_count, **self._counters}
+
+    def _before_call(self) -> bool:
+        """Decide se a chamada pode prosseguir; retorna True se for uma sonda HALF_OPEN"""
         with self._lock:
             if self.state == CircuitState.OPEN:
                 if self._should_attempt_reset():
                     self.state = CircuitState.HALF_OPEN
+                    self._half_open_in_flight = 0
                     logger.info("Circuit breaker: OPEN -> HALF_OPEN")
                 else:
-                    raise Exception("Circuit breaker is OPEN")
-            
-            try:
-                result = func(*args, **kwargs)
-                self._on_success()
-                return result
-            except Exception as e:
-                self._on_failure()
-                raise e
+                    self._counters['rejections'] += 1
+                    raise CircuitBreakerOpenError("Circuit breaker is OPEN")
+
+            is_probe = self.state == CircuitState.HALF_OPEN
+            if is_probe:
+                # Em HALF_OPEN apenas um número limitado de sondas passa
+                if self._half_open_in_flight >= self.half_open_max_calls:
+                    self._counters['rejections'] += 1
+                    raise CircuitBreakerOpenError("Circuit breaker is HALF_OPEN (probe in flight)")
+                self._half_open_in_flight += 1
+
+            self._counters['calls'] += 1
+            return is_probe
     
     def _should_attempt_reset(self) -> bool:
         if self.last_failure_time is None:
             return True
         return (datetime.now() - self.last_failure_time).total_seconds() >= self.recovery_timeout
     
-    def _on_success(self):
-        self.failure_count = 0
-        if self.state == CircuitState.HALF_OPEN:
-            self.state = CircuitState.CLOSED
-            logger.info("Circuit breaker: HALF_OPEN -> CLOSED")
+    def _on_success(self, is_probe: bool = False):
+        with self._lock:
+            self._counters['successes'] += 1
+            self.failure_count = 0
+            if is_probe:
+                self._half_open_in_flight -= 1
+            if self.state == CircuitState.HALF_OPEN:
+                self.state = CircuitState.CLOSED
+                logger.info("Circuit breaker: HALF_OPEN -> CLOSED")
     
-    def _on_failure(self):
-        self.failure_count += 1
-        self.last_failure_time = datetime.now()
-        
-        if self.failure_count >= self.failure_threshold:
-            self.state = CircuitState.OPEN
-            logger.warning(f"Circuit breaker: -> OPEN (failures: {self.failure_count})")
+    def _on_failure(self, is_probe: bool = False):
+        with self._lock:
+            self._counters['failures'] += 1
+            self.failure_count += 1
+            self.last_failure_time = datetime.now()
+            if is_probe:
+                self._half_open_in_flight -= 1
+
+            if self.state == CircuitState.HALF_OPEN or self.failure_count >= self.failure_threshold:
+                if self.state != CircuitState.OPEN:
+                    logger.warning(f"Circuit breaker: -> OPEN (failures: {self.failure_count})")
+                self.state = CircuitState.OPEN
 
 # Circuit breaker global para operações de DB
 db_circuit_breaker = CircuitBreaker(failure_threshold=5, recovery_timeout=30)
 
 # ==================== MEMORY CACHE ====================
+def approx_size(value: Any, depth: int = 0, max_depth: int = 6, sample: int = 8) -> int:
+    """Tamanho aproximado em bytes (sys.getsizeof recursivo, com amostragem).
+
+    Containers grandes são estimados pelos primeiros `sample` itens; objetos
+    contam pelo __dict__ (ou pelos __slots__). Barato o bastante para rodar a cada set.
+    """
+    size = sys.getsizeof(value, 64)
+    if depth >= max_depth:
+        return size
+    if isinstance(value, dict):
+        items = list(itertools.islice(value.items(), sample))
+        if items:
+            per_item = sum(approx_size(k, depth + 1) + approx_size(v, depth + 1) for k, v in items) / len(items)
+            size += int(per_item * len(value))
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        items = list(itertools.islice(value, sample))
+        if items:
+            size += int(sum(approx_size(v, depth + 1) for v in items) / len(items) * len(value))
+    elif hasattr(value, "__dict__") and not isinstance(value, type):
+        size += approx_size(vars(value), depth + 1)
+    elif hasattr(value, "__slots__") and not isinstance(value, type):
+        size += sum(approx_size(getattr(value, name, None), depth + 1) for name in value.__slots__)
+    return size
+
 class MemoryCache:
-    """Cache em memória com TTL - FIXED: default_ttl parameter"""
-    
-    def __init__(self, default_ttl: int = 30):  # FIX: era ttl=30
-        self._cache: Dict[str, Dict[str, Any]] = {}
+    """Cache LRU em memória com TTL, limite de entradas e de bytes aproximados.
+
+    get_or_load/get_or_load_many fazem single-flight (um único loader por chave,
+    os demais esperam o resultado) e, com stale_ttl, stale-while-revalidate:
+    entradas recém-expiradas continuam sendo servidas enquanto um refresh
+    roda em background.
+
+    Com validator (vários processos no mesmo banco), um hit só é confiado sem
+    consulta se PRAGMA data_version não mudou desde a última validação da
+    entrada; senão validator({chave: valor}) -> chaves desatualizadas decide,
+    com uma consulta mínima, quais entradas descartar.
+
+    Com version_of(valor) -> versão comparável, o resultado de um load (single-flight
+    ou refresh em background) não substitui uma entrada mais nova publicada por um
+    escritor enquanto a leitura estava em andamento.
+    """
+
+    def __init__(self, default_ttl: int = 30, max_entries: int = 1000,
+                 max_bytes: Optional[int] = None, name: str = "cache",
+                 stale_ttl: float = 0, load_timeout: float = 30.0, validator=None, version_of=None):
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
         self._lock = threading.RLock()
         self.default_ttl = default_ttl
-    
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.name = name
+        self.stale_ttl = stale_ttl
+        self.load_timeout = load_timeout
+        self.validator = validator
+        self.version_of = version_of
+        self._bytes = 0
+        self._inflight: Dict[str, Future] = {}
+        self._stats = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'evictions': 0,
+                       'expirations': 0, 'loads': 0, 'coalesced': 0,
+                       'validations': 0, 'invalidations': 0, 'superseded_loads': 0}
+        cache_sweeper.register(self)
+
     def get(self, key: str) -> Optional[Any]:
+        if self.validator is not None:
+            self._revalidate([key])
         with self._lock:
-            if key in self._cache:
-                entry = self._cache[key]
-                if datetime.now() < entry['expires']:
+            entry = self._cache.get(key)
+            if entry is not None:
+                now = time.monotonic()
+                if now < entry['expires']:
+                    self._cache.move_to_end(key)
+                    self._stats['hits'] += 1
                     return entry['data']
-                else:
-                    del self._cache[key]
+                if now >= entry['expires'] + self.stale_ttl:
+                    self._remove(key)
+                    self._stats['expirations'] += 1
+            self._stats['misses'] += 1
             return None
-    
-    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+
+    def get_or_load(self, key: str, loader, ttl: Optional[int] = None) -> Optional[Any]:
+        """Valor em cache ou loader() (None não é cacheado)"""
+        return self.get_or_load_many([key], lambda keys: {key: loader()}, ttl).get(key)
+
+    def get_or_load_many(self, keys: List[str], loader, ttl: Optional[int] = None) -> Dict[str, Any]:
+        """Valores em cache para keys; as ausentes são carregadas com loader(chaves_ausentes) -> {chave: valor}.
+
+        Chaves que já têm um load em andamento (de outra thread) não são recarregadas:
+        esta chamada espera o resultado dele.
+        """
+        keys = list(dict.fromkeys(keys))
+        if self.validator is not None:
+            self._revalidate(keys)
+
+        result: Dict[str, Any] = {}
+        waiting: Dict[str, Future] = {}
+        to_load: List[str] = []
+        to_refresh: List[str] = []
+
+        with self._lock:
+            now = time.monotonic()
+            for key in keys:
+                entry = self._cache.get(key)
+                if entry is not None:
+                    if now < entry['expires']:
+                        self._cache.move_to_end(key)
+                        self._stats['hits'] += 1
+                        result[key] = entry['data']
+                        continue
+                    if now < entry['expires'] + self.stale_ttl:
+                        # Stale-while-revalidate: devolve o snapshot anterior e agenda um refresh
+                        self._stats['stale_hits'] += 1
+                        result[key] = entry['data']
+                        if key not in self._inflight:
+                            self._inflight[key] = Future()
+                            to_refresh.append(key)
+                        continue
+                    self._remove(key)
+                    self._stats['expirations'] += 1
+
+                self._stats['misses'] += 1
+                future = self._inflight.get(key)
+                if future is not None:
+                    self._stats['coalesced'] += 1
+                    waiting[key] = future
+                else:
+                    self._inflight[key] = Future()
+                    to_load.append(key)
+
+        if to_refresh:
+            cache_sweeper.refresh(self._load, to_refresh, loader, ttl)
+        if to_load:
+            result.update(self._load(to_load, loader, ttl))
+        for key, future in waiting.items():
+            value = future.result(timeout=self.load_timeout)
+            if value is not None:
+                result[key] = value
+        return result
+
+    def _revalidate(self, keys: List[str]) -> None:
+        """Descarta entradas servíveis (dentro do TTL ou da janela stale) que outro
+        processo alterou no banco: stale-while-revalidate não serve dado já desatualizado"""
+        data_version = db_change_monitor.data_version()
+        now = time.monotonic()
+        with self._lock:
+            candidates = {}
+            for key in keys:
+                entry = self._cache.get(key)
+                if (entry is not None and now < entry['expires'] + self.stale_ttl and
+                        (data_version is None or entry.get('data_version') != data_version)):
+                    candidates[key] = entry['data']
+        if not candidates:
+            return
+
+        try:
+            stale = self.validator(candidates)
+        except Exception as e:
+            # Sem como validar, confia no TTL como antes
+            logger.warning(f"Cache validation failed ({self.name}): {e}")
+            return
+
+        with self._lock:
+            self._stats['validations'] += 1
+            for key, value in candidates.items():
+                entry = self._cache.get(key)
+                if entry is None or entry['data'] is not value:
+                    continue
+                if key in stale:
+                    self._remove(key)
+                    self._stats['invalidations'] += 1
+                else:
+                    entry['data_version'] = data_version
+
+    def _load(self, keys: List[str], loader, ttl: Optional[int]) -> Dict[str, Any]:
+        """Executa o loader como líder das chaves e acorda quem espera por elas"""
+        try:
+            loaded = loader(keys) or {}
+        except Exception as e:
+            with self._lock:
+                for key in keys:
+                    self._inflight.pop(key).set_exception(e)
+            raise
+
+        result = {}
+        with self._lock:
+            self._stats['loads'] += 1
+            for key in keys:
+                value = loaded.get(key)
+                if value is not None:
+                    value = self.set(key, value, ttl, keep_newer=True)
+                    result[key] = value
+                self._inflight.pop(key).set_result(value)
+        return result
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None, successor: bool = False,
+            keep_newer: bool = False) -> Any:
+        """successor=True: value substitui a entrada atual com tamanho parecido
+        (ex.: próximo snapshot de um Game) e herda a medida dela; o sweeper remede.
+        keep_newer=True (leituras do banco): mantém a entrada atual se version_of diz
+        que ela é mais nova que value. Retorna o valor que ficou no cache."""
         ttl = ttl or self.default_ttl
-        expires = datetime.now() + timedelta(seconds=ttl)
+        expires = time.monotonic() + ttl
         with self._lock:
-            self._cache[key] = {'data': value, 'expires': expires}
-    
+            previous = self._cache.get(key)
+            if previous is not None and previous['data'] is value:
+                # Mesmo objeto: renova TTL/LRU sem remedir
+                previous['expires'] = expires
+                self._cache.move_to_end(key)
+                return value
+            if (keep_newer and previous is not None and self.version_of is not None and
+                    self.version_of(previous['data']) > self.version_of(value)):
+                # Um escritor publicou durante a leitura: a leitura chegou atrasada
+                self._stats['superseded_loads'] += 1
+                return previous['data']
+            if not self.max_bytes:
+                size = 0
+            elif successor and previous is not None:
+                size = previous['size']
+            else:
+                size = approx_size(value)
+            if previous is not None:
+                self._remove(key)
+            self._cache[key] = {'data': value, 'expires': expires, 'size': size}
+            self._bytes += size
+            self._evict()
+        cache_sweeper.ensure_running()
+        return value
+
     def delete(self, key: str) -> None:
         with self._lock:
-            self._cache.pop(key, None)
-    
+            self._remove(key)
+
     def clear(self) -> None:
         with self._lock:
             self._cache.clear()
+            self._bytes = 0
 
-# Caches globais com TTL corrigido
-game_cache = MemoryCache(default_ttl=5)
-teacher_cache = MemoryCache(default_ttl=60)
+    def sweep(self) -> int:
+        """Remove entradas expiradas e remede as restantes; retorna quantas removeu"""
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, entry in self._cache.items() if entry['expires'] + self.stale_ttl <= now]
+            for key in expired:
+                self._remove(key)
+            self._stats['expirations'] += len(expired)
+            if self.max_bytes:
+                for entry in self._cache.values():
+                    size = approx_size(entry['data'])
+                    self._bytes += size - entry['size']
+                    entry['size'] = size
+                self._evict()
+            return len(expired)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._cache)
+            stats['approx_bytes'] = self._bytes
+        lookups = stats['hits'] + stats['stale_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['hits'] + stats['stale_hits']) / lookups, 4) if lookups else 0.0
+        return stats
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def _remove(self, key: str) -> None:
+        # Chamado com self._lock adquirido
+        entry = self._cache.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry['size']
+
+    def _evict(self) -> None:
+        # Chamado com self._lock adquirido: descarta as entradas menos usadas recentemente
+        while self._cache and (len(self._cache) > self.max_entries or
+                               (self.max_bytes and self._bytes > self.max_bytes and len(self._cache) > 1)):
+            _, entry = self._cache.popitem(last=False)
+            self._bytes -= entry['size']
+            self._stats['evictions'] += 1
+
+class CacheSweeper:
+    """Thread única que varre periodicamente as entradas expiradas de todos os caches,
+    mais um pequeno executor para os refreshes em background (stale-while-revalidate)"""
+
+    def __init__(self, interval: float = 30.0, refresh_workers: int = 2):
+        self.interval = interval
+        self.refresh_workers = refresh_workers
+        self._caches = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._refresh_executor = None
+
+    def refresh(self, func, *args) -> None:
+        with self._lock:
+            if self._refresh_executor is None:
+                self._refresh_executor = ThreadPoolExecutor(max_workers=self.refresh_workers,
+                                                            thread_name_prefix="cache-refresh")
+        self._refresh_executor.submit(self._run_refresh, func, *args)
 
-# ==================== DEDUPLICATION CACHE ====================
-class DeduplicationCache:
-    """Cache para prevenir operações duplicadas (idempotência)"""
-    
-    def __init__(self, ttl: int = 300):
-        self._cache: Dict[str, Any] = {}
-        self._lock = threading.RLock()
-        self.ttl = ttl
-    
-    def exists(self, operation_id: str) -> bool:
+    @staticmethod
+    def _run_refresh(func, *args) -> None:
+        try:
+            func(*args)
+        except Exception as e:
+            logger.warning(f"Background cache refresh failed: {e}")
+
+    def register(self, cache: "MemoryCache") -> None:
         with self._lock:
-            return operation_id in self._cache
-    
-    def get(self, operation_id: str) -> Optional[Any]:
+            self._caches.add(cache)
+
+    def ensure_running(self) -> None:
+        if self._thread is not None:
+            return
         with self._lock:
-            entry = self._cache.get(operation_id)
-            if entry and datetime.now() < entry['expires']:
-                return entry['data']
-            elif entry:
-                del self._cache[operation_id]
-            return None
-    
-    def set(self, operation_id: str, result: Any) -> None:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="cache-sweeper", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                caches = list(self._caches)
+            for cache in caches:
+                try:
+                    removed = cache.sweep()
+                    if removed:
+                        logger.debug(f"Cache sweep ({cache.name}): {removed} expired entries removed")
+                except Exception as e:
+                    logger.warning(f"Cache sweep failed ({cache.name}): {e}")
+
+cache_sweeper = CacheSweeper(interval=30.0)
+
+class DataVersionMonitor:
+    """PRAGMA data_version numa conexão dedicada por arquivo: o valor muda sempre
+    que outra conexão (deste ou de outro processo) faz commit no banco. Com shards,
+    a versão é a tupla dos valores de todos os arquivos."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._conns: Dict[str, sqlite3.Connection] = {}
+
+    def data_version(self) -> Optional[Any]:
         with self._lock:
-            expires = datetime.now() + timedelta(seconds=self.ttl)
-            self._cache[operation_id] = {'data': result, 'expires': expires}
+            versions = []
+            for shard in db_shards.all_shards():
+                try:
+                    conn = self._conns.get(shard.path)
+                    if conn is None:
+                        conn = self._conns[shard.path] = sqlite3.connect(shard.path, timeout=5,
+                                                                         check_same_thread=False)
+                    versions.append(conn.execute("PRAGMA data_version").fetchone()[0])
+                except Exception as e:
+                    logger.warning(f"data_version probe failed ({shard.path}): {e}")
+                    self._conns.pop(shard.path, None)
+                    return None
+            return versions[0] if len(versions) == 1 else tuple(versions)
 
-dedup_cache = DeduplicationCache(ttl=300)
+db_change_monitor = DataVersionMonitor()
+
+# Caches globais: LRU limitados por entradas e bytes aproximados
+# (um load do banco nunca substitui um snapshot com state_version maior, publicado durante a leitura)
+game_cache = MemoryCache(default_ttl=5, max_entries=500, max_bytes=128 * 1024 * 1024, name="game", stale_ttl=10,
+                         version_of=lambda game: game.state_version)
+teacher_cache = MemoryCache(default_ttl=60, max_entries=1000, max_bytes=8 * 1024 * 1024, name="teacher")
+# Resultados finais não mudam depois de gravados: TTL longo, sem validação entre processos
+results_cache = MemoryCache(default_ttl=600, max_entries=200, max_bytes=16 * 1024 * 1024, name="results")
+
+# ==================== DEDUPLICATION CACHE ====================
+# Idempotência é garantida pelo banco (UNIQUE em game_players/game_answers com
+# ON CONFLICT devolvendo o resultado anterior); este cache é só a camada da frente,
+# limitada e varrida, que evita a ida ao banco em double-clicks e reruns.
+# Guarda apenas resultados definitivos (resposta gravada, entrada confirmada).
+dedup_cache = MemoryCache(default_ttl=300, max_entries=20000, max_bytes=4 * 1024 * 1024, name="dedup")
 
 # ==================== CONNECTION POOL ====================
+DB_POOL_SIZE = int(_get_secret("ARYROOT_DB_POOL_SIZE", "20"))
+DB_POOL_TIMEOUT = float(_get_secret("ARYROOT_DB_POOL_TIMEOUT_S", "10"))
+DB_POOL_THREAD_AFFINITY = _get_secret("ARYROOT_DB_POOL_AFFINITY", "1").strip().lower() in ("1", "true", "yes")
+# Espera máxima pelo lock de escrita dentro do SQLite: transações de escrita são curtas
+DB_BUSY_TIMEOUT_MS = int(_get_secret("ARYROOT_DB_BUSY_TIMEOUT_MS", "5000"))
+
+class ConnectionPoolTimeout(sqlite3.OperationalError):
+    """Nenhuma conexão livre dentro do timeout (retry_db_operation trata como transitório)"""
+
+class _PoolWaiter:
+    __slots__ = ("event", "entry", "reserved")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.entry = None
+        self.reserved = False
+
 class ConnectionPool:
-    """Connection pool com cleanup garantido - FIXED: leak prevention"""
-    
-    def __init__(self, max_connections: int = 20):
-        self._connections = []
-        self._lock = threading.RLock()
+    """Pool de conexões SQLite com capacidade máxima.
+
+    get_connection reaproveita uma conexão livre, cria outra enquanto o total
+    está abaixo de max_connections e, no limite, entra numa fila FIFO até uma ser
+    devolvida ou o timeout vencer. A conexão devolvida vai direto para o primeiro
+    da fila (quem chega depois não fura a fila, então leitores em loop não
+    deixam escritores sem conexão). Conexões livres só são validadas (SELECT 1)
+    quando ficaram ociosas mais que validate_after segundos, fora do lock do pool.
+    Com thread_affinity, a thread recebe de volta a última conexão que usou se
+    ela estiver livre (caches de página e de statements aquecidos); a conexão
+    não fica presa à thread, então threads encerradas não consomem capacidade.
+    Com read_only, as conexões abrem o arquivo com mode=ro (URI) em autocommit.
+    """
+
+    def __init__(self, max_connections: int = 20, timeout: float = 10.0, validate_after: float = 30.0,
+                 thread_affinity: bool = True, read_only: bool = False, path: str = DATABASE_PATH):
+        self.path = path
+        self.read_only = read_only
         self.max_connections = max_connections
-        self._active_count = 0
-    
+        self.timeout = timeout
+        self.validate_after = validate_after
+        self.thread_affinity = thread_affinity
+        # id(conexão) -> (conexão, ocioso desde); a última inserida é a mais quente
+        self._idle: "OrderedDict[int, tuple]" = OrderedDict()
+        self._total = 0
+        self._waiters: "deque[_PoolWaiter]" = deque()
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._metrics = {'created': 0, 'reused': 0, 'affinity_hits': 0, 'waited': 0, 'timeouts': 0,
+                         'validated': 0, 'closed': 0, 'total_wait_ms': 0.0, 'max_wait_ms': 0.0}
+
     def get_connection(self):
+        start = time.monotonic()
+        waiter = None
+        reserved = False
         with self._lock:
-            if self._connections:
-                self._active_count += 1
-                return self._connections.pop()
-            return self._create_connection()
-    
+            entry = self._take_idle() if not self._waiters else None
+            if entry is None:
+                if not self._waiters and self._total < self.max_connections:
+                    # Reserva a vaga; a conexão é aberta fora do lock
+                    self._total += 1
+                    reserved = True
+                else:
+                    waiter = _PoolWaiter()
+                    self._waiters.append(waiter)
+
+        if waiter is not None:
+            waiter.event.wait(self.timeout)
+            with self._lock:
+                if not waiter.event.is_set():
+                    self._waiters.remove(waiter)
+                    self._metrics['timeouts'] += 1
+                    raise ConnectionPoolTimeout(
+                        f"No database connection available within {self.timeout}s "
+                        f"({self.max_connections} in use)"
+                    )
+                entry, reserved = waiter.entry, waiter.reserved
+                wait_ms = (time.monotonic() - start) * 1000
+                self._metrics['waited'] += 1
+                self._metrics['total_wait_ms'] += wait_ms
+                self._metrics['max_wait_ms'] = max(self._metrics['max_wait_ms'], wait_ms)
+
+        if reserved:
+            return self._open_reserved()
+
+        conn, idle_since = entry
+        if time.monotonic() - idle_since > self.validate_after:
+            self._count('validated')
+            try:
+                conn.execute("SELECT 1")
+            except sqlite3.Error:
+                self._discard(conn, reserve=True)
+                return self._open_reserved()
+        self._count('reused')
+        self._local.conn_id = id(conn)
+        return conn
+
     def return_connection(self, conn):
+        if conn is None:
+            return
+        try:
+            # get_db_connection já fez commit/rollback; só por segurança
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error as e:
+            logger.warning(f"Connection cleanup error: {e}")
+            self._discard(conn)
+            return
         with self._lock:
-            try:
-                self._active_count -= 1
-                if len(self._connections) < self.max_connections and conn:
-                    # Verificar se connection ainda é válida
-                    conn.execute("SELECT 1")
-                    self._connections.append(conn)
-                elif conn:
-                    conn.close()
-            except Exception as e:
-                logger.warning(f"Connection cleanup error: {e}")
-                try:
-                    conn.close()
-                except:
-                    pass
-    
+            if self._waiters:
+                # Entrega direta ao primeiro da fila
+                waiter = self._waiters.popleft()
+                waiter.entry = (conn, time.monotonic())
+                waiter.event.set()
+            else:
+                self._idle[id(conn)] = (conn, time.monotonic())
+
+    def get_metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics['max_connections'] = self.max_connections
+            metrics['open'] = self._total
+            metrics['idle'] = len(self._idle)
+            metrics['in_use'] = self._total - len(self._idle)
+        metrics['avg_wait_ms'] = round(metrics['total_wait_ms'] / metrics['waited'], 2) if metrics['waited'] else 0.0
+        metrics['total_wait_ms'] = round(metrics['total_wait_ms'], 2)
+        metrics['max_wait_ms'] = round(metrics['max_wait_ms'], 2)
+        return metrics
+
+    def _take_idle(self) -> Optional[tuple]:
+        # Chamado com self._lock adquirido
+        if not self._idle:
+            return None
+        if self.thread_affinity:
+            entry = self._idle.pop(getattr(self._local, "conn_id", None), None)
+            if entry is not None:
+                self._metrics['affinity_hits'] += 1
+                return entry
+        return self._idle.popitem(last=True)[1]
+
+    def _open_reserved(self):
+        """Abre uma conexão para a vaga já reservada em _total"""
+        try:
+            conn = self._create_connection()
+        except Exception:
+            with self._lock:
+                self._release_slot()
+            raise
+        self._count('created')
+        self._local.conn_id = id(conn)
+        return conn
+
+    def _discard(self, conn, reserve: bool = False) -> None:
+        """Fecha conn; com reserve a vaga continua reservada para quem vai abrir outra"""
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self._metrics['closed'] += 1
+            if not reserve:
+                self._release_slot()
+
+    def _release_slot(self) -> None:
+        # Chamado com self._lock adquirido: a vaga passa para o primeiro da fila, se houver
+        if self._waiters:
+            waiter = self._waiters.popleft()
+            waiter.reserved = True
+            waiter.event.set()
+        else:
+            self._total -= 1
+
+    def _count(self, metric: str) -> None:
+        with self._lock:
+            self._metrics[metric] += 1
+
     def _create_connection(self):
         try:
-            conn = sqlite3.connect(DATABASE_PATH, timeout=30, check_same_thread=False)
+            if self.read_only:
+                # Só leitura: nunca pega o lock de escrita; em WAL cada SELECT lê o último commit
+                # sem esperar escritores. Autocommit: nenhuma transação fica aberta entre leituras
+                uri = f"file:{urllib.parse.quote(os.path.abspath(self.path))}?mode=ro"
+                conn = sqlite3.connect(uri, uri=True, timeout=DB_BUSY_TIMEOUT_MS / 1000, check_same_thread=False,
+                                       isolation_level=None)
+                conn.row_factory = sqlite3.Row
+                conn.execute("PRAGMA cache_size=10000")
+                conn.execute("PRAGMA temp_store=memory")
+                return conn
+            conn = sqlite3.connect(self.path, timeout=DB_BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
             conn.row_factory = sqlite3.Row
             conn.execute("PRAGMA journal_mode=WAL")
             conn.execute("PRAGMA synchronous=NORMAL")
             conn.execute("PRAGMA cache_size=10000")
             conn.execute("PRAGMA temp_store=memory")
-            self._active_count += 1
             return conn
         except Exception as e:
             logger.error(f"Failed to create DB connection: {e}")
             raise
 
-db_pool = ConnectionPool()
+# ==================== DATABASE SHARDS ====================
+# Com ARYROOT_DB_SHARDS > 1, jogos, jogadores, respostas e estatísticas ficam em N
+# arquivos data/games_<i>.db; professores continuam em data/database.db
+DB_SHARDS = max(1, int(_get_secret("ARYROOT_DB_SHARDS", "1")))
+_GAME_TABLES = ("games", "game_players", "game_answers", "question_stats", "game_results")
 
-# ==================== DISTRIBUTED LOCK ====================
-class DistributedLock:
-    """Lock distribuído usando SQLite para concurrency control"""
-    
-    def __init__(self, key: str, timeout: int = 10):
-        self.key = f"lock:{key}"
-        self.timeout = timeout
-        self.lock_id = str(uuid.uuid4())
-        self._acquired = False
-    
-    def acquire(self) -> bool:
-        """Adquire lock com timeout"""
-        start_time = time.time()
-        
-        while time.time() - start_time < self.timeout:
-            try:
-                with get_db_connection() as conn:
-                    cursor = conn.cursor()
-                    # Tentar criar lock row
-                    cursor.execute('''
-                        INSERT OR IGNORE INTO locks (key, lock_id, expires_at)
-                        VALUES (?, ?, datetime('now', '+10 seconds'))
-                    ''', (self.key, self.lock_id))
-                    
-                    if cursor.rowcount > 0:
-                        self._acquired = True
-                        return True
-                    
-                    # Limpar locks expirados
-                    cursor.execute("DELETE FROM locks WHERE expires_at < datetime('now')")
-                    
-            except Exception as e:
-                logger.warning(f"Lock acquire error: {e}")
-            
-            time.sleep(0.05)  # 50ms backoff
-        
-        return False
-    
-    def release(self):
-        """Release lock apenas se owner"""
-        if not self._acquired:
-            return
-        
-        try:
-            with get_db_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("DELETE FROM locks WHERE key = ? AND lock_id = ?", 
-                             (self.key, self.lock_id))
-                self._acquired = False
-        except Exception as e:
-            logger.error(f"Lock release error: {e}")
-    
-    def __enter__(self):
-        if not self.acquire():
-            raise TimeoutError(f"Failed to acquire lock: {self.key}")
-        return self
-    
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        self.release()
+class DatabaseShard:
+    """Um arquivo SQLite com seus pools (escrita e leitura) e o gate de escrita do processo.
+    Cada arquivo tem o próprio lock de escrita no SQLite: shards diferentes gravam em paralelo."""
+
+    def __init__(self, name: str, path: str):
+        self.name = name
+        self.path = path
+        self.pool = ConnectionPool(DB_POOL_SIZE, DB_POOL_TIMEOUT, thread_affinity=DB_POOL_THREAD_AFFINITY, path=path)
+        # Leituras de polling (get_by_code a cada refresh de cada sessão) não disputam vagas com escritas
+        self.read_pool = ConnectionPool(DB_POOL_SIZE, DB_POOL_TIMEOUT, thread_affinity=DB_POOL_THREAD_AFFINITY,
+                                        read_only=True, path=path)
+        self.write_gate = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"DatabaseShard({self.name!r}, {self.path!r})"
+
+class ShardRouter:
+    """Escolhe o arquivo de cada jogo pelo hash do código.
+
+    Usa crc32 (estável entre processos e reinícios; hash() do Python muda a cada
+    processo). Com um único shard, os jogos ficam no próprio banco principal,
+    exatamente como antes do sharding.
+    """
+
+    def __init__(self, main_path: str, shard_count: int = 1):
+        self.main = DatabaseShard("main", main_path)
+        self.shard_count = max(1, shard_count)
+        if self.shard_count == 1:
+            self.game_shards = [self.main]
+        else:
+            directory = os.path.dirname(main_path)
+            self.game_shards = [DatabaseShard(f"games_{i}", os.path.join(directory, f"games_{i}.db"))
+                                for i in range(self.shard_count)]
+
+    @property
+    def sharded(self) -> bool:
+        return self.shard_count > 1
+
+    def shard_index(self, code: str) -> int:
+        return zlib.crc32(code.encode("utf-8")) % self.shard_count
+
+    def for_game(self, code: str) -> DatabaseShard:
+        return self.game_shards[self.shard_index(code)]
+
+    def group_codes(self, codes: List[str]) -> Dict[DatabaseShard, List[str]]:
+        """Códigos agrupados por shard (uma consulta por arquivo)"""
+        groups: Dict[DatabaseShard, List[str]] = {}
+        for code in codes:
+            groups.setdefault(self.for_game(code), []).append(code)
+        return groups
+
+    def all_shards(self) -> List[DatabaseShard]:
+        """Todos os arquivos: principal e, se houver, os de jogos"""
+        return [self.main] + (self.game_shards if self.sharded else [])
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {
+            'shards': self.shard_count,
+            'files': {shard.name: {'path': shard.path, 'in_use': shard.pool.get_metrics()['in_use'],
+                                   'read_in_use': shard.read_pool.get_metrics()['in_use']}
+                      for shard in self.all_shards()}
+        }
+
+db_shards = ShardRouter(DATABASE_PATH, DB_SHARDS)
+db_pool = db_shards.main.pool
+db_read_pool = db_shards.main.read_pool
+
+# Vários processos (ex.: vários workers Streamlit) compartilham os mesmos arquivos
+# do banco: hits de cache passam a ser revalidados (ver final do arquivo)
+MULTI_PROCESS = _get_secret("ARYROOT_MULTI_PROCESS", "0").strip().lower() in ("1", "true", "yes")
 
 # ==================== GET DB CONNECTION ====================
 @contextmanager
-def get_db_connection():
-    """Context manager para conexões do pool - FIXED: retorna conexão real"""
+def get_db_connection(read_only: bool = False, shard: Optional[DatabaseShard] = None):
+    """Context manager para conexões do pool - FIXED: retorna conexão real.
+    read_only: conexão mode=ro do pool de leitura, sem commit/rollback (não escreve)
+    shard: arquivo a usar (db_shards.for_game(código) para tabelas de jogo); padrão, o banco principal"""
+    shard = shard or db_shards.main
+    pool = shard.read_pool if read_only else shard.pool
     conn = None
     try:
-        conn = db_pool.get_connection()
+        conn = pool.get_connection()
         yield conn
-        conn.commit()
+        if not read_only:
+            conn.commit()
     except Exception as e:
-        if conn:
+        if conn and not read_only:
             try:
                 conn.rollback()
             except Exception as rollback_error:
@@ -286,7 +817,76 @@ def get_db_connection():
         raise e
     finally:
         if conn:
-            db_pool.return_connection(conn)
+            pool.return_connection(conn)
+
+# ==================== WRITE TRANSACTIONS ====================
+class WriteTransactionStats:
+    """Espera pelo lock de escrita (gate do processo + busy do SQLite) por call site de write_transaction"""
+
+    def __init__(self, busy_threshold_ms: float = 1.0):
+        self.busy_threshold_ms = busy_threshold_ms
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def record(self, site: str, waited_ms: float, failed: bool = False) -> None:
+        with self._lock:
+            stats = self._stats.get(site)
+            if stats is None:
+                stats = self._stats[site] = {'transactions': 0, 'busy': 0, 'failed': 0,
+                                             'total_wait_ms': 0.0, 'max_wait_ms': 0.0}
+            if failed:
+                stats['failed'] += 1
+            else:
+                stats['transactions'] += 1
+            if waited_ms >= self.busy_threshold_ms:
+                stats['busy'] += 1
+            stats['total_wait_ms'] += waited_ms
+            stats['max_wait_ms'] = max(stats['max_wait_ms'], waited_ms)
+
+    def get_metrics(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                site: {**stats, 'total_wait_ms': round(stats['total_wait_ms'], 2),
+                       'max_wait_ms': round(stats['max_wait_ms'], 2),
+                       'busy_rate': stats['busy'] / (stats['transactions'] + stats['failed'])
+                       if stats['transactions'] + stats['failed'] else 0.0}
+                for site, stats in self._stats.items()
+            }
+
+write_transaction_stats = WriteTransactionStats()
+
+@contextmanager
+def write_transaction(site: str, shard: Optional[DatabaseShard] = None):
+    """Transação de escrita que pega o lock de escrita já no BEGIN IMMEDIATE.
+
+    Uma transação deferred só pede o lock na primeira escrita; se ela já leu e
+    outra conexão escreveu nesse meio-tempo, o upgrade falha com "database is
+    locked" sem passar pelo busy handler e cai no backoff do retry_db_operation.
+    Aqui a espera acontece uma vez, no BEGIN, dentro do busy_timeout do SQLite
+    (ARYROOT_DB_BUSY_TIMEOUT_MS), e o tempo esperado fica registrado por site em
+    write_transaction_stats. Commit/rollback como em get_db_connection.
+    shard: arquivo onde escrever (padrão, o banco principal).
+    """
+    shard = shard or db_shards.main
+    start = time.perf_counter()
+    # Um escritor por vez por arquivo neste processo: os demais dormem no lock (sem polling,
+    # mas sem ordem garantida) e o busy handler do SQLite só entra na disputa com outros
+    # processos. O gate vem antes do checkout: quem espera não segura conexão do pool
+    with shard.write_gate:
+        with get_db_connection(shard=shard) as conn:
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+            except sqlite3.OperationalError:
+                write_transaction_stats.record(site, (time.perf_counter() - start) * 1000, failed=True)
+                raise
+            write_transaction_stats.record(site, (time.perf_counter() - start) * 1000)
+            try:
+                yield conn
+                # Commit ainda dentro do gate: o próximo escritor não esbarra no lock do SQLite
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
 
 # ==================== RETRY WITH JITTER ====================
 def exponential_backoff_with_jitter(attempt: int, base_delay: float = 0.1, max_delay: float = 10.0) -> float:
@@ -326,100 +926,915 @@ def retry_db_operation(max_retries: int = 3, base_delay: float = 0.1):
 
 # ==================== DATABASE SETUP ====================
 def setup_data_directory():
-    """Setup com schema versioning - FIXED: uso correto do context manager"""
-    os.makedirs("data", exist_ok=True)
-    
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-
-        # Criar tabela de locks para distributed locking
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS locks (
-            key TEXT PRIMARY KEY,
-            lock_id TEXT NOT NULL,
-            expires_at TIMESTAMP NOT NULL
-        )
-        ''')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_locks_expires ON locks(expires_at)')
-
-        # Criar tabela de professores
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS teachers (
-            username TEXT PRIMARY KEY,
-            password TEXT NOT NULL,
-            name TEXT NOT NULL,
-            email TEXT NOT NULL,
-            questions TEXT DEFAULT '[]',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        ''')
-
-        # Criar tabela de jogos com índices otimizados
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS games (
-            code TEXT PRIMARY KEY,
-            teacher_username TEXT NOT NULL,
-            questions TEXT DEFAULT '[]',
-            players TEXT DEFAULT '{}',
-            status TEXT DEFAULT 'waiting',
-            current_question INTEGER DEFAULT 0,
-            start_time TEXT,
-            question_start_time TEXT,
-            time_limit INTEGER DEFAULT 20,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (teacher_username) REFERENCES teachers (username)
-        )
-        ''')
-        # Migração: adicionar time_limit em DBs existentes
+    """Prepara o backend de armazenamento (schema, migrações) e o professor demo"""
+    teacher_store.setup()
+    game_store.setup()
+
+    # Inserir professor demo
+    if teacher_store.get("professor") is None:
+        demo_username = "professor"
+        demo_plain_password = _get_secret("DEMO_PROFESSOR_PASSWORD")
+        demo_name = _get_secret("DEMO_PROFESSOR_NAME", "Professor Demo")
+        demo_email = _get_secret("DEMO_PROFESSOR_EMAIL", "professor@demo.com")
+
+        if demo_plain_password:
+            hashed_password = bcrypt.hashpw(demo_plain_password.encode('utf-8'), bcrypt.gensalt())
+            teacher_data_demo = {
+                "username": demo_username,
+                "password": hashed_password.decode('utf-8'),
+                "name": demo_name,
+                "email": demo_email,
+                "questions": json.dumps(SAMPLE_QUESTIONS)
+            }
+            try:
+                if teacher_store.insert(teacher_data_demo):
+                    logger.info(f"Demo user '{demo_username}' created")
+            except sqlite3.Error as e:
+                logger.error(f"Failed to create demo user: {e}")
+
+def _create_game_tables(cursor) -> None:
+    """Schema das tabelas por jogo (games, jogadores, respostas, estatísticas, resultados)"""
+    # Criar tabela de jogos com índices otimizados
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS games (
+        code TEXT PRIMARY KEY,
+        teacher_username TEXT NOT NULL,
+        questions TEXT DEFAULT '[]',
+        players TEXT DEFAULT '{}',
+        status TEXT DEFAULT 'waiting',
+        current_question INTEGER DEFAULT 0,
+        start_time TEXT,
+        question_start_time TEXT,
+        question_start_ms INTEGER,
+        question_deadline_ms INTEGER,
+        question_closed INTEGER NOT NULL DEFAULT 0,
+        time_limit INTEGER DEFAULT 20,
+        version INTEGER NOT NULL DEFAULT 1,
+        state_version INTEGER NOT NULL DEFAULT 1,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (teacher_username) REFERENCES teachers (username)
+    )
+    ''')
+    # Migração: adicionar time_limit em DBs existentes
+    try:
+        cursor.execute("ALTER TABLE games ADD COLUMN time_limit INTEGER DEFAULT 20")
+    except sqlite3.OperationalError:
+        pass
+    # Migração: início/prazo da pergunta em epoch ms (question_start_time ISO fica como legado)
+    for column in ("question_start_ms", "question_deadline_ms"):
         try:
-            cursor.execute("ALTER TABLE games ADD COLUMN time_limit INTEGER DEFAULT 20")
+            cursor.execute(f"ALTER TABLE games ADD COLUMN {column} INTEGER")
         except sqlite3.OperationalError:
             pass
-        
-        # Índices compostos para performance
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_games_status ON games(status)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_games_teacher ON games(teacher_username)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_games_status_teacher ON games(status, teacher_username)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_games_updated ON games(updated_at)')
-
-        # Inserir professor demo
-        cursor.execute("SELECT COUNT(*) FROM teachers WHERE username = ?", ("professor",))
-        if cursor.fetchone()[0] == 0:
-            demo_username = "professor"
-            demo_plain_password = _get_secret("DEMO_PROFESSOR_PASSWORD")
-            demo_name = _get_secret("DEMO_PROFESSOR_NAME", "Professor Demo")
-            demo_email = _get_secret("DEMO_PROFESSOR_EMAIL", "professor@demo.com")
-
-            if demo_plain_password:
-                hashed_password = bcrypt.hashpw(demo_plain_password.encode('utf-8'), bcrypt.gensalt())
-                teacher_data_demo = {
-                    "username": demo_username,
-                    "password": hashed_password.decode('utf-8'),
-                    "name": demo_name,
-                    "email": demo_email,
-                    "questions": json.dumps(SAMPLE_QUESTIONS)
-                }
-                try:
-                    cursor.execute('''
-                    INSERT INTO teachers (username, password, name, email, questions)
-                    VALUES (:username, :password, :name, :email, :questions)
-                    ''', teacher_data_demo)
-                    logger.info(f"Demo user '{demo_username}' created")
-                except sqlite3.Error as e:
-                    logger.error(f"Failed to create demo user: {e}")
+    # Migração: pergunta fechada pelo question_scheduler (prazo encerrado)
+    try:
+        cursor.execute("ALTER TABLE games ADD COLUMN question_closed INTEGER NOT NULL DEFAULT 0")
+    except sqlite3.OperationalError:
+        pass
+    # Migração: version para compare-and-swap (linhas existentes começam em 1)
+    try:
+        cursor.execute("ALTER TABLE games ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+    except sqlite3.OperationalError:
+        pass
+    # Migração: state_version para detecção de mudanças pelas páginas (polling)
+    try:
+        cursor.execute("ALTER TABLE games ADD COLUMN state_version INTEGER NOT NULL DEFAULT 1")
+    except sqlite3.OperationalError:
+        pass
+    
+    # Índices compostos para performance
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_games_status ON games(status)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_games_teacher ON games(teacher_username)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_games_status_teacher ON games(status, teacher_username)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_games_updated ON games(updated_at)')
+
+    # Jogadores e respostas normalizados (uma linha por jogador / resposta)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS game_players (
+        game_code TEXT NOT NULL,
+        nickname TEXT NOT NULL,
+        icon TEXT,
+        joined_at TEXT,
+        session_id TEXT,
+        PRIMARY KEY (game_code, nickname)
+    )
+    ''')
+    try:
+        cursor.execute('ALTER TABLE game_players ADD COLUMN session_id TEXT')
+    except sqlite3.OperationalError:
+        pass
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS game_answers (
+        game_code TEXT NOT NULL,
+        nickname TEXT NOT NULL,
+        question INTEGER NOT NULL,
+        answer INTEGER,
+        correct INTEGER NOT NULL DEFAULT 0,
+        time REAL,
+        points INTEGER NOT NULL DEFAULT 0,
+        streak INTEGER NOT NULL DEFAULT 0,
+        answered_at TEXT,
+        UNIQUE (game_code, nickname, question)
+    )
+    ''')
+
+    # Estatísticas congeladas de cada pergunta ao fechar (question_scheduler)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS question_stats (
+        game_code TEXT NOT NULL,
+        question INTEGER NOT NULL,
+        answered INTEGER NOT NULL DEFAULT 0,
+        correct INTEGER NOT NULL DEFAULT 0,
+        option_counts TEXT DEFAULT '[]',
+        avg_time_ms INTEGER,
+        median_time_ms INTEGER,
+        closed_at_ms INTEGER,
+        PRIMARY KEY (game_code, question)
+    )
+    ''')
+
+    # Resultado final de cada jogo, calculado uma vez ao terminar (GameResults)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS game_results (
+        game_code TEXT PRIMARY KEY,
+        ranking TEXT NOT NULL DEFAULT '[]',
+        question_stats TEXT NOT NULL DEFAULT '[]',
+        player_summaries TEXT NOT NULL DEFAULT '{}',
+        finished_at_ms INTEGER
+    )
+    ''')
+
+def _game_key_column(table: str) -> str:
+    return "code" if table == "games" else "game_code"
+
+def _rebalance_game_shards() -> None:
+    """Move para o arquivo indicado pelo db_shards os jogos gravados em outro lugar
+    (banco de antes do sharding ou outro ARYROOT_DB_SHARDS). Idempotente: copia com
+    INSERT OR IGNORE, faz commit e só então apaga da origem."""
+    directory = os.path.dirname(db_shards.main.path)
+    sources = [db_shards.main.path] + sorted(glob.glob(os.path.join(directory, "games_*.db")))
+    for source in sources:
+        conn = sqlite3.connect(source, timeout=DB_BUSY_TIMEOUT_MS / 1000)
+        try:
+            if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'games'").fetchone():
+                continue
+            misplaced: Dict[DatabaseShard, List[str]] = {}
+            for (code,) in conn.execute("SELECT code FROM games"):
+                shard = db_shards.for_game(code)
+                if os.path.abspath(shard.path) != os.path.abspath(source):
+                    misplaced.setdefault(shard, []).append(code)
+        finally:
+            conn.close()
+
+        for shard, codes in misplaced.items():
+            _move_games(source, shard, codes)
+            logger.info(f"Moved {len(codes)} games from {source} to {shard.path}")
+
+def _move_games(source: str, shard: DatabaseShard, codes: List[str]) -> None:
+    """Copia as linhas dos jogos codes (todas as tabelas de jogo) de source para o shard"""
+    codes_json = json.dumps(codes)
+    conn = sqlite3.connect(shard.path, timeout=DB_BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+    try:
+        conn.execute("ATTACH DATABASE ? AS src", (source,))
+        tables = []
+        for table in _GAME_TABLES:
+            source_columns = {row[1] for row in conn.execute(f"PRAGMA src.table_info({table})")}
+            if source_columns:
+                columns = [row[1] for row in conn.execute(f"PRAGMA main.table_info({table})")
+                           if row[1] in source_columns]
+                tables.append((table, ", ".join(columns)))
+
+        # Em WAL o commit não é atômico entre arquivos: primeiro grava no destino, depois apaga da origem
+        conn.execute("BEGIN IMMEDIATE")
+        for table, columns in tables:
+            conn.execute(f'''
+            INSERT OR IGNORE INTO main.{table} ({columns})
+            SELECT {columns} FROM src.{table}
+            WHERE {_game_key_column(table)} IN (SELECT value FROM json_each(?)) ORDER BY rowid
+            ''', (codes_json,))
+        conn.execute("COMMIT")
+        conn.execute("BEGIN IMMEDIATE")
+        for table, _ in tables:
+            conn.execute(f"DELETE FROM src.{table} WHERE {_game_key_column(table)} IN (SELECT value FROM json_each(?))",
+                         (codes_json,))
+        conn.execute("COMMIT")
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+# ==================== PLAYERS / ANSWERS STORAGE ====================
+_INSERT_PLAYER_SQL = '''
+    INSERT INTO game_players (game_code, nickname, icon, joined_at, session_id)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (game_code, nickname) DO NOTHING
+'''
+
+_INSERT_ANSWER_SQL = '''
+    INSERT INTO game_answers
+    (game_code, nickname, question, answer, correct, time, points, streak, answered_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (game_code, nickname, question) DO NOTHING
+'''
+
+_UPDATE_GAME_ROW_SQL = '''
+    UPDATE games SET
+        status = :status,
+        current_question = :current_question,
+        start_time = :start_time,
+        question_start_time = :question_start_time,
+        question_start_ms = :question_start_ms,
+        question_deadline_ms = :question_deadline_ms,
+        question_closed = :question_closed,
+        time_limit = :time_limit,
+        updated_at = :updated_at,
+        version = version + 1
+    WHERE code = :code
+'''
+
+def _answer_row(code: str, nickname: str, answer: "AnswerRecord") -> tuple:
+    return (
+        code, nickname, answer.question, answer.answer, 1 if answer.correct else 0,
+        answer.time, answer.points, answer.streak, answer.timestamp
+    )
+
+def _answer_result(row) -> tuple:
+    """(is_correct, points, streak) de uma linha de game_answers"""
+    return (bool(row["correct"]), row["points"], row["streak"])
+
+def _prior_answer_result(conn, code: str, nickname: str, question: int) -> Optional[tuple]:
+    """Resultado da resposta já gravada para (jogo, jogador, pergunta), se houver"""
+    row = conn.execute(
+        "SELECT correct, points, streak FROM game_answers WHERE game_code = ? AND nickname = ? AND question = ?",
+        (code, nickname, question)
+    ).fetchone()
+    return _answer_result(row) if row else None
+
+def _migrate_legacy_players(cursor) -> None:
+    """Move blobs games.players legados para game_players/game_answers (idempotente)"""
+    cursor.execute("SELECT code, players FROM games WHERE players IS NOT NULL AND players NOT IN ('', '{}')")
+    rows = cursor.fetchall()
+
+    for row in rows:
+        code = row[0]
+        try:
+            players = json.loads(row[1])
+        except json.JSONDecodeError:
+            players = {}
+
+        if isinstance(players, dict):
+            for nickname, data in players.items():
+                if not isinstance(data, dict):
+                    continue
+                cursor.execute(_INSERT_PLAYER_SQL, (code, nickname, data.get("icon"), data.get("joined_at"), None))
+                answers = data.get("answers", [])
+                if isinstance(answers, list):
+                    cursor.executemany(_INSERT_ANSWER_SQL, [
+                        _answer_row(code, nickname, AnswerRecord.from_dict(ans)) for ans in answers if isinstance(ans, dict)
+                    ])
+
+        cursor.execute("UPDATE games SET players = '{}' WHERE code = ?", (code,))
+
+    if rows:
+        logger.info(f"Migrated legacy players blobs of {len(rows)} games")
+
+def _load_players(cursor, codes: List[str]) -> Dict[str, Dict[str, "PlayerSnapshot"]]:
+    """Hidrata os jogadores (PlayerSnapshot imutáveis) de vários jogos"""
+    players_by_game: Dict[str, Dict[str, PlayerSnapshot]] = {code: {} for code in codes}
+    if not codes:
+        return players_by_game
+
+    placeholders = ','.join('?' * len(codes))
+    answers: Dict[tuple, List[AnswerRecord]] = {}
+    cursor.execute(
+        f"SELECT * FROM game_answers WHERE game_code IN ({placeholders}) ORDER BY question", codes
+    )
+    for row in cursor.fetchall():
+        answers.setdefault((row["game_code"], row["nickname"]), []).append(AnswerRecord.from_row(row))
+
+    cursor.execute(
+        f"SELECT game_code, nickname, icon, joined_at, session_id FROM game_players "
+        f"WHERE game_code IN ({placeholders}) ORDER BY rowid", codes
+    )
+    for row in cursor.fetchall():
+        player_answers = tuple(answers.get((row["game_code"], row["nickname"]), ()))
+        players_by_game[row["game_code"]][row["nickname"]] = PlayerSnapshot(
+            icon=row["icon"],
+            score=sum(a.points for a in player_answers),
+            answers=player_answers,
+            joined_at=row["joined_at"],
+            session_id=row["session_id"]
+        )
+
+    return players_by_game
 
 def generate_game_code():
     return ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
 
+# ==================== STORAGE BACKENDS ====================
+# ARYROOT_STORAGE=memory guarda professores e jogos só em memória (testes de carga,
+# demos curtas): nenhuma escrita em disco, tudo se perde ao reiniciar o processo
+# (o backend efetivo é decidido por create_stores, mais abaixo)
+STORAGE_BACKEND = _get_secret("ARYROOT_STORAGE", "sqlite").strip().lower()
+
+class TeacherStore(ABC):
+    """Persistência de professores. Linhas são mapeamentos com as colunas de teachers."""
+
+    def setup(self) -> None:
+        """Prepara o backend (diretório, schema); idempotente"""
+
+    @abstractmethod
+    def insert(self, data: Dict[str, Any]) -> bool:
+        """Insere o professor se o username ainda não existe"""
+
+    @abstractmethod
+    def save(self, data: Dict[str, Any]) -> None:
+        """Insere ou substitui o professor"""
+
+    @abstractmethod
+    def get(self, username: str) -> Optional[Any]:
+        """Linha do professor (None se não existe)"""
+
+    @abstractmethod
+    def updated_at_many(self, usernames: List[str]) -> Dict[str, Any]:
+        """updated_at atual de cada professor existente (validator de cache)"""
+
+    @abstractmethod
+    def list_except(self, username: str) -> List[Any]:
+        """Todos os professores menos username, mais recentes primeiro"""
+
+    @abstractmethod
+    def delete(self, username: str) -> bool:
+        """Remove o professor; False se não existia"""
+
+class GameStore(ABC):
+    """Persistência de jogos, jogadores, respostas, estatísticas e resultados.
+
+    Cada método é atômico (uma transação no SQLite; o lock do store em memória) e
+    aplica no próprio store as regras que decidem corridas entre sessões: CAS pela
+    version da linha, entrada só com o jogo em 'waiting', uma resposta por jogador
+    e pergunta, só na pergunta atual e aberta. Escritas que mudam o estado visível
+    sobem state_version e o devolvem. Linhas de games são mapeamentos com as
+    colunas da tabela; jogadores vêm como {apelido: PlayerSnapshot}, em ordem de entrada.
+    """
+
+    def setup(self) -> None:
+        """Prepara o backend (diretório, schema, migrações); idempotente"""
+
+    def ping(self) -> None:
+        """Falha se o backend não responde (health check)"""
+
+    @abstractmethod
+    def insert_game(self, data: Dict[str, Any]) -> None:
+        """Cria a linha do jogo; sqlite3.IntegrityError se o código já existe"""
+
+    @abstractmethod
+    def update_game(self, data: Dict[str, Any]) -> Optional[int]:
+        """Compare-and-swap por data['version']: novo state_version, ou None se a linha mudou"""
+
+    @abstractmethod
+    def get_game_row(self, code: str) -> Optional[Any]:
+        """Só a linha de games (sem jogadores/respostas)"""
+
+    @abstractmethod
+    def load_games(self, codes: List[str]) -> Dict[str, Tuple[Any, Dict[str, "PlayerSnapshot"]]]:
+        """{código: (linha, jogadores)} dos jogos existentes"""
+
+    @abstractmethod
+    def load_teacher_games(self, teacher_username: str) -> List[Tuple[Any, Dict[str, "PlayerSnapshot"]]]:
+        """(linha, jogadores) dos jogos do professor, mais recentes primeiro"""
+
+    @abstractmethod
+    def state_versions(self, codes: List[str]) -> Dict[str, int]:
+        """state_version atual dos jogos existentes"""
+
+    @abstractmethod
+    def add_player(self, code: str, nickname: str, player: "PlayerSnapshot") -> Tuple[bool, Optional[int]]:
+        """(True, state_version) se entrou; (True, None) se o apelido já é da mesma sessão;
+        (False, None) se é de outra sessão ou o jogo não está em 'waiting'"""
+
+    @abstractmethod
+    def add_answer(self, code: str, nickname: str, answer: "AnswerRecord") -> Tuple[Optional[int], Optional[tuple]]:
+        """(state_version, None) se aceita; (None, resultado anterior ou None) se recusada"""
+
+    @abstractmethod
+    def add_answer_batch(self, code: str, select) -> Tuple[Dict[str, "AnswerRecord"], Dict[tuple, tuple], Optional[int]]:
+        """Lote do answer writer: select(pergunta atual, {(apelido, pergunta): resultado já gravado})
+        -> {apelido: resposta} roda dentro da transação. Retorna (aceitas, já gravadas, state_version)"""
+
+    @abstractmethod
+    def persist_batch(self, code: str, players: List[Tuple[str, "PlayerSnapshot"]],
+                      answers: List[Tuple[str, "AnswerRecord"]], game_data: Optional[Dict[str, Any]]) -> int:
+        """Lote do GameActor (já validado em memória): grava tudo, sem CAS; retorna o state_version"""
+
+    @abstractmethod
+    def freeze_question_stats(self, code: str, q_idx: int, option_count: int) -> None:
+        """Grava uma vez as estatísticas finais da pergunta a partir das respostas gravadas"""
+
+    @abstractmethod
+    def get_question_stats(self, code: str) -> Dict[int, Dict[str, Any]]:
+        """{pergunta: estatísticas congeladas (formato de QuestionStats.to_dict)} das perguntas fechadas"""
+
+    @abstractmethod
+    def get_results(self, code: str) -> Optional[Any]:
+        """Linha de game_results do jogo (None se ainda não foi gravada)"""
+
+    @abstractmethod
+    def insert_results(self, row: Dict[str, Any]) -> Any:
+        """Grava o resultado se ainda não existe; retorna o que ficou gravado"""
+
+class SQLiteTeacherStore(TeacherStore):
+    """Tabela teachers do banco principal"""
+
+    def setup(self) -> None:
+        os.makedirs(os.path.dirname(db_shards.main.path) or ".", exist_ok=True)
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+
+            # Criar tabela de professores
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS teachers (
+                username TEXT PRIMARY KEY,
+                password TEXT NOT NULL,
+                name TEXT NOT NULL,
+                email TEXT NOT NULL,
+                questions TEXT DEFAULT '[]',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            ''')
+
+    def insert(self, data: Dict[str, Any]) -> bool:
+        with write_transaction("teacher.insert") as conn:
+            cursor = conn.execute('''
+            INSERT INTO teachers (username, password, name, email, questions)
+            VALUES (:username, :password, :name, :email, :questions)
+            ON CONFLICT (username) DO NOTHING
+            ''', data)
+            return cursor.rowcount > 0
+
+    def save(self, data: Dict[str, Any]) -> None:
+        with write_transaction("teacher.save") as conn:
+            conn.execute('''
+            INSERT OR REPLACE INTO teachers (username, password, name, email, questions, updated_at)
+            VALUES (:username, :password, :name, :email, :questions, :updated_at)
+            ''', data)
+
+    def get(self, username: str) -> Optional[Any]:
+        with get_db_connection(read_only=True) as conn:
+            return conn.execute("SELECT * FROM teachers WHERE username = ?", (username,)).fetchone()
+
+    def updated_at_many(self, usernames: List[str]) -> Dict[str, Any]:
+        placeholders = ','.join('?' * len(usernames))
+        with get_db_connection(read_only=True) as conn:
+            rows = conn.execute(
+                f"SELECT username, updated_at FROM teachers WHERE username IN ({placeholders})", usernames
+            ).fetchall()
+        return {row["username"]: row["updated_at"] for row in rows}
+
+    def list_except(self, username: str) -> List[Any]:
+        with get_db_connection(read_only=True) as conn:
+            return conn.execute(
+                "SELECT * FROM teachers WHERE username != ? ORDER BY created_at DESC", (username,)
+            ).fetchall()
+
+    def delete(self, username: str) -> bool:
+        with write_transaction("teacher.delete") as conn:
+            return conn.execute("DELETE FROM teachers WHERE username = ?", (username,)).rowcount > 0
+
+class SQLiteGameStore(GameStore):
+    """Tabelas de jogo no SQLite: no banco principal ou nos arquivos de db_shards"""
+
+    def setup(self) -> None:
+        os.makedirs(os.path.dirname(db_shards.main.path) or ".", exist_ok=True)
+        # Tabelas de jogos: no banco principal, ou nos arquivos de shard (ARYROOT_DB_SHARDS > 1)
+        for shard in db_shards.game_shards:
+            with get_db_connection(shard=shard) as conn:
+                _create_game_tables(conn.cursor())
+        # Jogos gravados com outro número de shards (ou antes do sharding) vão para o arquivo certo
+        _rebalance_game_shards()
+        for shard in db_shards.game_shards:
+            with get_db_connection(shard=shard) as conn:
+                # Migração: mover blobs games.players para as tabelas normalizadas
+                _migrate_legacy_players(conn.cursor())
+
+    def ping(self) -> None:
+        with get_db_connection() as conn:
+            conn.execute("SELECT 1").fetchone()
+
+    def insert_game(self, data: Dict[str, Any]) -> None:
+        with write_transaction("game.save", db_shards.for_game(data["code"])) as conn:
+            conn.execute('''
+            INSERT INTO games
+            (code, teacher_username, questions, status, current_question, start_time, question_start_time,
+             question_start_ms, question_deadline_ms, question_closed, time_limit, version, updated_at)
+            VALUES (:code, :teacher_username, :questions, :status, :current_question, :start_time, :question_start_time,
+                    :question_start_ms, :question_deadline_ms, :question_closed, :time_limit, :version, :updated_at)
+            ''', data)
+
+    def update_game(self, data: Dict[str, Any]) -> Optional[int]:
+        with write_transaction("game.save", db_shards.for_game(data["code"])) as conn:
+            row = conn.execute('''
+            UPDATE games SET
+                teacher_username = :teacher_username,
+                questions = :questions,
+                status = :status,
+                current_question = :current_question,
+                start_time = :start_time,
+                question_start_time = :question_start_time,
+                question_start_ms = :question_start_ms,
+                question_deadline_ms = :question_deadline_ms,
+                question_closed = :question_closed,
+                time_limit = :time_limit,
+                updated_at = :updated_at,
+                version = version + 1,
+                state_version = state_version + 1
+            WHERE code = :code AND version = :version
+            RETURNING state_version
+            ''', data).fetchone()
+        return row["state_version"] if row else None
+
+    def get_game_row(self, code: str) -> Optional[Any]:
+        with get_db_connection(read_only=True, shard=db_shards.for_game(code)) as conn:
+            return conn.execute("SELECT * FROM games WHERE code = ?", (code,)).fetchone()
+
+    def load_games(self, codes: List[str]) -> Dict[str, Tuple[Any, Dict[str, "PlayerSnapshot"]]]:
+        result = {}
+        for shard, shard_codes in db_shards.group_codes(codes).items():
+            with get_db_connection(read_only=True, shard=shard) as conn:
+                cursor = conn.cursor()
+                placeholders = ','.join('?' * len(shard_codes))
+                cursor.execute(f"SELECT * FROM games WHERE code IN ({placeholders})", shard_codes)
+                rows = cursor.fetchall()
+                players_by_game = _load_players(cursor, [row["code"] for row in rows])
+            for row in rows:
+                result[row["code"]] = (row, players_by_game[row["code"]])
+        return result
+
+    def load_teacher_games(self, teacher_username: str) -> List[Tuple[Any, Dict[str, "PlayerSnapshot"]]]:
+        # Jogos do professor espalhados pelos shards: uma consulta por arquivo, mesclada por created_at
+        loaded = []
+        for shard in db_shards.game_shards:
+            with get_db_connection(read_only=True, shard=shard) as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT * FROM games WHERE teacher_username = ?", (teacher_username,))
+                rows = cursor.fetchall()
+                players_by_game = _load_players(cursor, [row["code"] for row in rows])
+            loaded.extend((row, players_by_game[row["code"]]) for row in rows)
+        loaded.sort(key=lambda item: item[0]["created_at"] or "", reverse=True)
+        return loaded
+
+    def state_versions(self, codes: List[str]) -> Dict[str, int]:
+        current = {}
+        for shard, shard_codes in db_shards.group_codes(codes).items():
+            placeholders = ','.join('?' * len(shard_codes))
+            with get_db_connection(read_only=True, shard=shard) as conn:
+                rows = conn.execute(
+                    f"SELECT code, state_version FROM games WHERE code IN ({placeholders})", shard_codes
+                ).fetchall()
+            current.update((row["code"], row["state_version"]) for row in rows)
+        return current
+
+    def add_player(self, code: str, nickname: str, player: "PlayerSnapshot") -> Tuple[bool, Optional[int]]:
+        with write_transaction("game.add_player", db_shards.for_game(code)) as conn:
+            cursor = conn.execute('''
+            INSERT INTO game_players (game_code, nickname, icon, joined_at, session_id)
+            SELECT ?, ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM games WHERE code = ? AND status = 'waiting')
+            ON CONFLICT (game_code, nickname) DO NOTHING
+            ''', (code, nickname, player.icon, player.joined_at, player.session_id, code))
+            if cursor.rowcount > 0:
+                return True, _bump_state_version(conn, code)
+            if player.session_id is None:
+                return False, None
+            row = conn.execute(
+                "SELECT session_id FROM game_players WHERE game_code = ? AND nickname = ?", (code, nickname)
+            ).fetchone()
+            return (row is not None and row["session_id"] == player.session_id), None
+
+    def add_answer(self, code: str, nickname: str, answer: "AnswerRecord") -> Tuple[Optional[int], Optional[tuple]]:
+        with write_transaction("game.record_answer", db_shards.for_game(code)) as conn:
+            cursor = conn.execute('''
+            INSERT INTO game_answers
+            (game_code, nickname, question, answer, correct, time, points, streak, answered_at)
+            SELECT ?, ?, ?, ?, ?, ?, ?, ?, ?
+            WHERE EXISTS (
+                SELECT 1 FROM games
+                WHERE code = ? AND status = 'active' AND current_question = ? AND question_closed = 0
+            ) AND EXISTS (
+                SELECT 1 FROM game_players WHERE game_code = ? AND nickname = ?
+            )
+            ON CONFLICT (game_code, nickname, question) DO NOTHING
+            ''', _answer_row(code, nickname, answer) + (code, answer.question, code, nickname))
+            if cursor.rowcount > 0:
+                return _bump_state_version(conn, code), None
+            return None, _prior_answer_result(conn, code, nickname, answer.question)
+
+    def add_answer_batch(self, code: str, select) -> Tuple[Dict[str, "AnswerRecord"], Dict[tuple, tuple], Optional[int]]:
+        with write_transaction("answer_writer.batch", db_shards.for_game(code)) as conn:
+            row = conn.execute(
+                "SELECT status, current_question, question_closed FROM games WHERE code = ?", (code,)
+            ).fetchone()
+            if not row or row["status"] != "active":
+                return {}, {}, None
+            q_idx = row["current_question"]
+            # Respostas já gravadas nesta pergunta (por qualquer processo): a repetição recebe o resultado anterior
+            prior = {(r["nickname"], q_idx): _answer_result(r) for r in conn.execute(
+                "SELECT nickname, correct, points, streak FROM game_answers WHERE game_code = ? AND question = ?",
+                (code, q_idx)
+            )}
+            accepted = {} if row["question_closed"] else select(q_idx, prior)
+            if accepted:
+                # Só jogadores que existem no banco (o snapshot pode ter um jogador removido)
+                players = {r["nickname"] for r in conn.execute(
+                    "SELECT nickname FROM game_players WHERE game_code = ?", (code,)
+                )}
+                accepted = {nickname: answer for nickname, answer in accepted.items() if nickname in players}
+            if not accepted:
+                return {}, prior, None
+            conn.executemany(_INSERT_ANSWER_SQL, [
+                _answer_row(code, nickname, answer) for nickname, answer in accepted.items()
+            ])
+            # Um único incremento de state_version por lote
+            return accepted, prior, _bump_state_version(conn, code)
+
+    def persist_batch(self, code: str, players: List[Tuple[str, "PlayerSnapshot"]],
+                      answers: List[Tuple[str, "AnswerRecord"]], game_data: Optional[Dict[str, Any]]) -> int:
+        with write_transaction("game_actor.persist", db_shards.for_game(code)) as conn:
+            if players:
+                conn.executemany(_INSERT_PLAYER_SQL, [
+                    (code, nickname, player.icon, player.joined_at, player.session_id) for nickname, player in players
+                ])
+            if answers:
+                conn.executemany(_INSERT_ANSWER_SQL, [_answer_row(code, nickname, answer) for nickname, answer in answers])
+            if game_data is not None:
+                conn.execute(_UPDATE_GAME_ROW_SQL, game_data)
+            return _bump_state_version(conn, code)
+
+    def freeze_question_stats(self, code: str, q_idx: int, option_count: int) -> None:
+        with write_transaction("game.close_question", db_shards.for_game(code)) as conn:
+            # Do banco (e não do snapshot): inclui respostas gravadas por outros processos
+            stats = QuestionStats.from_answers(option_count, (
+                AnswerRecord.from_row(row) for row in conn.execute(
+                    "SELECT * FROM game_answers WHERE game_code = ? AND question = ?", (code, q_idx)
+                )
+            ))
+            conn.execute('''
+            INSERT INTO question_stats
+            (game_code, question, answered, correct, option_counts, avg_time_ms, median_time_ms, closed_at_ms)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (game_code, question) DO NOTHING
+            ''', (
+                code, q_idx, stats.answered, stats.correct, json.dumps(list(stats.option_counts)),
+                stats.mean_time_ms, stats.median_time_ms, epoch_ms()
+            ))
+
+    def get_question_stats(self, code: str) -> Dict[int, Dict[str, Any]]:
+        with get_db_connection(read_only=True, shard=db_shards.for_game(code)) as conn:
+            return {row["question"]: {
+                "option_counts": json.loads(row["option_counts"] or "[]"), "answered": row["answered"],
+                "correct": row["correct"], "mean_time_ms": row["avg_time_ms"], "median_time_ms": row["median_time_ms"]
+            } for row in conn.execute("SELECT * FROM question_stats WHERE game_code = ?", (code,))}
+
+    def get_results(self, code: str) -> Optional[Any]:
+        with get_db_connection(read_only=True, shard=db_shards.for_game(code)) as conn:
+            return conn.execute("SELECT * FROM game_results WHERE game_code = ?", (code,)).fetchone()
+
+    def insert_results(self, row: Dict[str, Any]) -> Any:
+        with write_transaction("game_results.materialize", db_shards.for_game(row["game_code"])) as conn:
+            conn.execute('''
+            INSERT INTO game_results (game_code, ranking, question_stats, player_summaries, finished_at_ms)
+            VALUES (:game_code, :ranking, :question_stats, :player_summaries, :finished_at_ms)
+            ON CONFLICT (game_code) DO NOTHING
+            ''', row)
+            return conn.execute("SELECT * FROM game_results WHERE game_code = ?", (row["game_code"],)).fetchone()
+
+class InMemoryTeacherStore(TeacherStore):
+    """Professores num dict protegido por lock (nada vai para o disco)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rows: Dict[str, Dict[str, Any]] = {}
+        self._sequence = itertools.count()
+
+    def insert(self, data: Dict[str, Any]) -> bool:
+        with self._lock:
+            if data["username"] in self._rows:
+                return False
+            self._store(data)
+            return True
+
+    def save(self, data: Dict[str, Any]) -> None:
+        with self._lock:
+            self._store(data)
+
+    def get(self, username: str) -> Optional[Any]:
+        with self._lock:
+            row = self._rows.get(username)
+            return dict(row) if row else None
+
+    def updated_at_many(self, usernames: List[str]) -> Dict[str, Any]:
+        with self._lock:
+            return {name: self._rows[name]["updated_at"] for name in usernames if name in self._rows}
+
+    def list_except(self, username: str) -> List[Any]:
+        with self._lock:
+            rows = [dict(row) for name, row in self._rows.items() if name != username]
+        rows.sort(key=lambda row: row["_sequence"], reverse=True)
+        return rows
+
+    def delete(self, username: str) -> bool:
+        with self._lock:
+            return self._rows.pop(username, None) is not None
+
+    def _store(self, data: Dict[str, Any]) -> None:
+        # Chamado com self._lock adquirido; INSERT OR REPLACE também recria created_at
+        now = datetime.now().isoformat()
+        self._rows[data["username"]] = {
+            "questions": "[]", **data, "created_at": now, "updated_at": data.get("updated_at") or now,
+            "_sequence": next(self._sequence)
+        }
+
+class InMemoryGameStore(GameStore):
+    """Jogos em dicts protegidos por um lock (o equivalente ao lock de escrita do
+    SQLite): mesmas regras e mesmos retornos do SQLiteGameStore, sem disco.
+    Jogadores ficam como PlayerSnapshot imutáveis; leituras devolvem cópias."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._games: Dict[str, Dict[str, Any]] = {}
+        self._players: Dict[str, Dict[str, PlayerSnapshot]] = {}
+        self._question_stats: Dict[Tuple[str, int], Dict[str, Any]] = {}
+        self._results: Dict[str, Dict[str, Any]] = {}
+        self._sequence = itertools.count()
+
+    def insert_game(self, data: Dict[str, Any]) -> None:
+        with self._lock:
+            if data["code"] in self._games:
+                raise sqlite3.IntegrityError("UNIQUE constraint failed: games.code")
+            now = datetime.now().isoformat()
+            self._games[data["code"]] = {
+                **data, "players": "{}", "state_version": 1, "created_at": now, "_sequence": next(self._sequence)
+            }
+            self._players[data["code"]] = {}
+
+    def update_game(self, data: Dict[str, Any]) -> Optional[int]:
+        with self._lock:
+            row = self._games.get(data["code"])
+            if row is None or row["version"] != data["version"]:
+                return None
+            row.update({key: value for key, value in data.items() if key not in ("code", "version")})
+            row["version"] += 1
+            row["state_version"] += 1
+            return row["state_version"]
+
+    def get_game_row(self, code: str) -> Optional[Any]:
+        with self._lock:
+            row = self._games.get(code)
+            return dict(row) if row else None
+
+    def load_games(self, codes: List[str]) -> Dict[str, Tuple[Any, Dict[str, "PlayerSnapshot"]]]:
+        with self._lock:
+            return {code: (dict(self._games[code]), dict(self._players[code]))
+                    for code in codes if code in self._games}
+
+    def load_teacher_games(self, teacher_username: str) -> List[Tuple[Any, Dict[str, "PlayerSnapshot"]]]:
+        with self._lock:
+            loaded = [(dict(row), dict(self._players[code])) for code, row in self._games.items()
+                      if row["teacher_username"] == teacher_username]
+        loaded.sort(key=lambda item: item[0]["_sequence"], reverse=True)
+        return loaded
+
+    def state_versions(self, codes: List[str]) -> Dict[str, int]:
+        with self._lock:
+            return {code: self._games[code]["state_version"] for code in codes if code in self._games}
+
+    def add_player(self, code: str, nickname: str, player: "PlayerSnapshot") -> Tuple[bool, Optional[int]]:
+        with self._lock:
+            row = self._games.get(code)
+            existing = self._players.get(code, {}).get(nickname)
+            if existing is None and row is not None and row["status"] == "waiting":
+                self._players[code][nickname] = player
+                return True, self._bump(code)
+            if player.session_id is None or existing is None:
+                return False, None
+            return existing.session_id == player.session_id, None
+
+    def add_answer(self, code: str, nickname: str, answer: "AnswerRecord") -> Tuple[Optional[int], Optional[tuple]]:
+        with self._lock:
+            player = self._players.get(code, {}).get(nickname)
+            prior = player.answer_for(answer.question) if player else None
+            if prior is not None:
+                return None, prior.result()
+            if player is None or not self._is_open(code, answer.question):
+                return None, None
+            self._players[code][nickname] = _with_answer_sorted(player, answer)
+            return self._bump(code), None
+
+    def add_answer_batch(self, code: str, select) -> Tuple[Dict[str, "AnswerRecord"], Dict[tuple, tuple], Optional[int]]:
+        with self._lock:
+            row = self._games.get(code)
+            if not row or row["status"] != "active":
+                return {}, {}, None
+            q_idx = row["current_question"]
+            players = self._players[code]
+            prior = {(nickname, q_idx): answer.result() for nickname, answer in
+                     ((nickname, player.answer_for(q_idx)) for nickname, player in players.items()) if answer}
+            accepted = {} if row["question_closed"] else select(q_idx, prior)
+            accepted = {nickname: answer for nickname, answer in accepted.items() if nickname in players}
+            if not accepted:
+                return {}, prior, None
+            for nickname, answer in accepted.items():
+                players[nickname] = _with_answer_sorted(players[nickname], answer)
+            return accepted, prior, self._bump(code)
+
+    def persist_batch(self, code: str, players: List[Tuple[str, "PlayerSnapshot"]],
+                      answers: List[Tuple[str, "AnswerRecord"]], game_data: Optional[Dict[str, Any]]) -> int:
+        with self._lock:
+            stored = self._players[code]
+            for nickname, player in players:
+                stored.setdefault(nickname, player)
+            for nickname, answer in answers:
+                player = stored.get(nickname)
+                if player is not None and player.answer_for(answer.question) is None:
+                    stored[nickname] = _with_answer_sorted(player, answer)
+            if game_data is not None:
+                row = self._games[code]
+                row.update({key: value for key, value in game_data.items()
+                            if key not in ("code", "version", "teacher_username", "questions")})
+                row["version"] += 1
+            return self._bump(code)
+
+    def freeze_question_stats(self, code: str, q_idx: int, option_count: int) -> None:
+        with self._lock:
+            if (code, q_idx) in self._question_stats:
+                return
+            stats = QuestionStats.from_answers(option_count, (
+                answer for answer in (player.answer_for(q_idx) for player in self._players.get(code, {}).values())
+                if answer is not None
+            ))
+            self._question_stats[(code, q_idx)] = {**stats.to_dict(), "closed_at_ms": epoch_ms()}
+
+    def get_question_stats(self, code: str) -> Dict[int, Dict[str, Any]]:
+        with self._lock:
+            return {q_idx: dict(stats) for (stats_code, q_idx), stats in self._question_stats.items()
+                    if stats_code == code}
+
+    def get_results(self, code: str) -> Optional[Any]:
+        with self._lock:
+            row = self._results.get(code)
+            return dict(row) if row else None
+
+    def insert_results(self, row: Dict[str, Any]) -> Any:
+        with self._lock:
+            return dict(self._results.setdefault(row["game_code"], dict(row)))
+
+    def _is_open(self, code: str, q_idx: int) -> bool:
+        row = self._games.get(code)
+        return (row is not None and row["status"] == "active" and row["current_question"] == q_idx
+                and not row["question_closed"])
+
+    def _bump(self, code: str) -> int:
+        # Chamado com self._lock adquirido
+        row = self._games[code]
+        row["state_version"] += 1
+        return row["state_version"]
+
+def _with_answer_sorted(player: "PlayerSnapshot", answer: "AnswerRecord") -> "PlayerSnapshot":
+    """with_answer mantendo as respostas em ordem de pergunta (como _load_players)"""
+    updated = player.with_answer(answer)
+    if player.answers and player.answers[-1].question > answer.question:
+        updated = replace(updated, answers=tuple(sorted(updated.answers, key=lambda a: a.question)))
+    return updated
+
+def create_stores(backend: str = "sqlite") -> Tuple[GameStore, TeacherStore]:
+    """Par (game_store, teacher_store) do backend ("sqlite" ou "memory").
+    Nome desconhecido, ou memory com ARYROOT_MULTI_PROCESS=1, usa sqlite (com aviso)."""
+    if backend not in ("sqlite", "memory"):
+        logger.warning(f"Unknown ARYROOT_STORAGE '{backend}'; using sqlite")
+        backend = "sqlite"
+    # Memória não é compartilhada entre processos: cada um teria seus próprios jogos
+    if backend == "memory" and MULTI_PROCESS:
+        logger.warning("ARYROOT_STORAGE=memory requires a single process; using sqlite because ARYROOT_MULTI_PROCESS=1")
+        backend = "sqlite"
+    if backend == "memory":
+        return InMemoryGameStore(), InMemoryTeacherStore()
+    return SQLiteGameStore(), SQLiteTeacherStore()
+
+game_store, teacher_store = create_stores(STORAGE_BACKEND)
+STORAGE_BACKEND = "memory" if isinstance(game_store, InMemoryGameStore) else "sqlite"
+
 # ==================== TEACHER MODEL ====================
 class Teacher:
-    def __init__(self, username, password, name, email, questions_json_str="[]"):
+    def __init__(self, username, password, name, email, questions_json_str="[]", updated_at=None):
         self.username = username
         self.password = password
         self.name = name
         self.email = email
+        # Igual ao teachers.updated_at gravado: valida o cache entre processos
+        self.updated_at = updated_at
         try:
             self.questions = json.loads(questions_json_str) if questions_json_str else []
         except json.JSONDecodeError:
@@ -439,7 +1854,8 @@ class Teacher:
     def from_db_row(cls, row):
         if not row:
             return None
-        return cls(row["username"], row["password"], row["name"], row["email"], row["questions"])
+        return cls(row["username"], row["password"], row["name"], row["email"], row["questions"],
+                   row["updated_at"])
 
     def add_question(self, question):
         if not isinstance(self.questions, list):
@@ -451,13 +1867,9 @@ class Teacher:
     def save(self):
         """Save com write-through cache"""
         try:
-            with get_db_connection() as conn:
-                cursor = conn.cursor()
-                data = self.to_dict_for_db()
-                cursor.execute('''
-                INSERT OR REPLACE INTO teachers (username, password, name, email, questions, updated_at)
-                VALUES (:username, :password, :name, :email, :questions, :updated_at)
-                ''', data)
+            data = self.to_dict_for_db()
+            teacher_store.save(data)
+            self.updated_at = data["updated_at"]
 
             teacher_cache.set(f"teacher:{self.username}", self)
             logger.info(f"Teacher saved: {self.username}")
@@ -476,20 +1888,22 @@ class Teacher:
             return cached
         
         try:
-            with get_db_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT * FROM teachers WHERE username = ?", (username,))
-                row = cursor.fetchone()
-                teacher = cls.from_db_row(row)
-                
-                if teacher:
-                    teacher_cache.set(f"teacher:{username}", teacher)
-                
-                return teacher
+            teacher = cls.from_db_row(teacher_store.get(username))
+            if teacher:
+                teacher_cache.set(f"teacher:{username}", teacher)
+            return teacher
         except Exception as e:
             logger.error(f"Failed to get teacher {username}: {e}")
             return None
 
+    @staticmethod
+    def find_stale_cached(cached: Dict[str, 'Teacher']) -> set:
+        """Validator de cache: chaves cujo professor mudou (ou sumiu) no banco"""
+        by_username = {teacher.username: key for key, teacher in cached.items()}
+        current = teacher_store.updated_at_many(list(by_username))
+        return {key for username, key in by_username.items()
+                if current.get(username) != cached[key].updated_at}
+
     @classmethod
     def create(cls, username, password, name, email):
         hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
@@ -499,11 +1913,7 @@ class Teacher:
     @retry_db_operation()
     def get_all_teachers_except_admin(cls):
         try:
-            with get_db_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT * FROM teachers WHERE username != 'professor' ORDER BY created_at DESC")
-                rows = cursor.fetchall()
-                return [cls.from_db_row(row) for row in rows]
+            return [cls.from_db_row(row) for row in teacher_store.list_except("professor")]
         except Exception as e:
             logger.error(f"Failed to get teachers: {e}")
             return []
@@ -512,11 +1922,7 @@ class Teacher:
     @retry_db_operation()
     def delete_by_username(cls, username):
         try:
-            with get_db_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("DELETE FROM teachers WHERE username = ?", (username,))
-                success = cursor.rowcount > 0
-                
+            success = teacher_store.delete(username)
             teacher_cache.delete(f"teacher:{username}")
             logger.info(f"Teacher deleted: {username}")
             return success
@@ -524,14 +1930,456 @@ class Teacher:
             logger.error(f"Failed to delete teacher {username}: {e}")
             return False
 
+# ==================== GAME EVENT BUS ====================
+class _GameChannel:
+    __slots__ = ("condition", "version", "phase", "waiters")
+
+    def __init__(self, lock):
+        self.condition = threading.Condition(lock)
+        self.version = 0
+        self.phase: Optional[tuple] = None
+        self.waiters = 0
+
+class GameEventBus:
+    """Pub/sub em processo por jogo.
+
+    Toda mudança gravada (entrada, resposta, início, próxima pergunta, fim)
+    publica o novo state_version do jogo; sessões bloqueadas em
+    wait_for_change acordam na hora, via condition variable, em vez de
+    esperar o próximo poll. Com ARYROOT_MULTI_PROCESS=1 a espera também
+    consulta games.state_version, porque outros processos não publicam aqui.
+
+    Junto com a versão vai a fase do jogo (Game.phase), que só muda no início,
+    na próxima pergunta, no fechamento e no fim: phase(código) é uma leitura sem
+    bloqueio para telas que só precisam saber quando a pergunta muda.
+    """
+
+    def __init__(self, multi_process: bool = False, poll_interval: float = 0.5, max_tracked_games: int = 1024):
+        self.multi_process = multi_process
+        self.poll_interval = poll_interval
+        self.max_tracked_games = max_tracked_games
+        self._lock = threading.Lock()
+        self._channels: "OrderedDict[str, _GameChannel]" = OrderedDict()
+        self._metrics = {'publishes': 0, 'wakeups': 0, 'timeouts': 0}
+
+    def publish(self, code: str, state_version: int, phase: Optional[tuple] = None) -> None:
+        with self._lock:
+            channel = self._channel(code)
+            if state_version <= channel.version:
+                return
+            channel.version = state_version
+            if phase is not None:
+                channel.phase = phase
+            self._metrics['publishes'] += 1
+            if channel.waiters:
+                channel.condition.notify_all()
+
+    def wait_for_change(self, code: str, since_version: int, timeout: float) -> Optional[int]:
+        """Bloqueia até o jogo passar de since_version; retorna a nova versão ou None no timeout"""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                channel = self._channel(code)
+                if channel.version > since_version:
+                    self._metrics['wakeups'] += 1
+                    return channel.version
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._metrics['timeouts'] += 1
+                    return None
+                channel.waiters += 1
+                try:
+                    channel.condition.wait(min(remaining, self.poll_interval) if self.multi_process else remaining)
+                finally:
+                    channel.waiters -= 1
+
+            if self.multi_process:
+                current = Game.get_state_version(code)
+                if current is not None and current > since_version:
+                    # Mudança feita por outro processo: o snapshot em cache está velho
+                    game_cache.delete(f"game:{code}")
+                    self.publish(code, current)
+
+    def phase(self, code: str) -> Optional[tuple]:
+        """Última fase publicada neste processo (None se o jogo não publicou nada ainda)"""
+        with self._lock:
+            channel = self._channels.get(code)
+            return channel.phase if channel is not None else None
+
+    def get_metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics['tracked_games'] = len(self._channels)
+            metrics['waiters'] = sum(channel.waiters for channel in self._channels.values())
+        return metrics
+
+    def _channel(self, code: str) -> _GameChannel:
+        # Chamado com self._lock adquirido
+        channel = self._channels.get(code)
+        if channel is None:
+            channel = self._channels[code] = _GameChannel(self._lock)
+            if len(self._channels) > self.max_tracked_games:
+                # Descarta o canal menos usado que não tem ninguém esperando
+                for old_code, old_channel in self._channels.items():
+                    if not old_channel.waiters and old_code != code:
+                        del self._channels[old_code]
+                        break
+        else:
+            self._channels.move_to_end(code)
+        return channel
+
+game_event_bus = GameEventBus(multi_process=MULTI_PROCESS)
+
 # ==================== GAME MODEL ====================
+class GameVersionConflict(Exception):
+    """Outro escritor atualizou a linha de games desde a última leitura"""
+
+class OptimisticWriteStats:
+    """Taxa de conflito das escritas compare-and-swap por operação"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def record(self, operation: str, conflicted: bool = False, exhausted: bool = False) -> None:
+        with self._lock:
+            stats = self._stats.setdefault(operation, {'attempts': 0, 'conflicts': 0, 'exhausted': 0})
+            stats['attempts'] += 1
+            if conflicted:
+                stats['conflicts'] += 1
+            if exhausted:
+                stats['exhausted'] += 1
+
+    def get_metrics(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                op: {**stats, 'conflict_rate': stats['conflicts'] / stats['attempts'] if stats['attempts'] else 0.0}
+                for op, stats in self._stats.items()
+            }
+
+game_write_stats = OptimisticWriteStats()
+
+def _bump_state_version(conn, code: str) -> int:
+    """Incrementa games.state_version na transação corrente e retorna o novo valor"""
+    row = conn.execute(
+        "UPDATE games SET state_version = state_version + 1 WHERE code = ? RETURNING state_version", (code,)
+    ).fetchone()
+    return row["state_version"]
+
+def calculate_points(is_correct: bool, time_taken: float, time_limit: float, streak: int) -> int:
+    """Pontuação Kahoot: base 1000 pontos, time decay linear, streak bonus.
+    Se tempo > limite: ZERO pontos mesmo acertando."""
+    if not is_correct or time_taken > time_limit:
+        return 0
+    # Fórmula Kahoot: pontos = base * (1 - (time / limit) / 2)
+    time_factor = 1.0 - (min(time_taken, time_limit) / time_limit) / 2.0
+    base_points = max(500, int(1000 * time_factor))
+    # Streak bonus: +100 por acerto consecutivo (cap 500)
+    streak_bonus = min((streak - 1) * 100, 500)
+    return base_points + streak_bonus
+
+def _iso_to_ms(value: Optional[str]) -> Optional[int]:
+    """ISO 8601 (formato das colunas de data) -> epoch em ms"""
+    if not value:
+        return None
+    try:
+        return int(datetime.fromisoformat(value).timestamp() * 1000)
+    except (ValueError, TypeError):
+        return None
+
+def _ms_to_iso(value: Optional[int]) -> Optional[str]:
+    return datetime.fromtimestamp(value / 1000).isoformat() if value is not None else None
+
+def epoch_ms() -> int:
+    return time.time_ns() // 1_000_000
+
+class QuestionClock:
+    """Tempo decorrido desde um instante em epoch ms, medido pelo relógio monotônico.
+
+    O epoch ms gravado no banco vale entre processos; dentro do processo, a
+    primeira leitura de cada início fixa uma âncora monotônica e as seguintes
+    não dependem mais do relógio de parede (que pode pular com NTP/ajustes).
+    """
+
+    def __init__(self, max_tracked: int = 1024):
+        self.max_tracked = max_tracked
+        self._anchors: "OrderedDict[int, int]" = OrderedDict()  # start_ms -> monotonic ns no início
+        self._lock = threading.Lock()
+
+    def elapsed_ms(self, start_ms: int) -> int:
+        now = time.monotonic_ns()
+        with self._lock:
+            anchor = self._anchors.get(start_ms)
+            if anchor is None:
+                anchor = now - max(0, epoch_ms() - start_ms) * 1_000_000
+                self._anchors[start_ms] = anchor
+                if len(self._anchors) > self.max_tracked:
+                    self._anchors.popitem(last=False)
+        return (now - anchor) // 1_000_000
+
+question_clock = QuestionClock()
+
+@dataclass(frozen=True, slots=True)
+class AnswerRecord:
+    """Resposta gravada de um jogador (imutável e compacta: sem __dict__, tempos em ms inteiros).
+    time/timestamp expõem o formato JSON legado (segundos e ISO 8601)."""
+    question: int
+    answer: Optional[int]
+    correct: bool
+    time_ms: Optional[int]
+    points: int
+    streak: int
+    answered_at_ms: Optional[int] = None
+
+    @property
+    def time(self) -> Optional[float]:
+        return self.time_ms / 1000 if self.time_ms is not None else None
+
+    @property
+    def timestamp(self) -> Optional[str]:
+        return _ms_to_iso(self.answered_at_ms)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "AnswerRecord":
+        time_taken = data.get("time")
+        return cls(
+            question=data.get("question", 0), answer=data.get("answer"), correct=bool(data.get("correct")),
+            time_ms=int(round(time_taken * 1000)) if time_taken is not None else None,
+            points=data.get("points", 0), streak=data.get("streak", 0),
+            answered_at_ms=_iso_to_ms(data.get("timestamp"))
+        )
+
+    @classmethod
+    def from_row(cls, row) -> "AnswerRecord":
+        """Linha de game_answers"""
+        return cls(
+            question=row["question"], answer=row["answer"], correct=bool(row["correct"]),
+            time_ms=int(round(row["time"] * 1000)) if row["time"] is not None else None,
+            points=row["points"], streak=row["streak"], answered_at_ms=_iso_to_ms(row["answered_at"])
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"question": self.question, "answer": self.answer, "correct": self.correct, "time": self.time,
+                "points": self.points, "streak": self.streak, "timestamp": self.timestamp}
+
+    def result(self) -> tuple:
+        """(is_correct, points, streak), o retorno de record_answer"""
+        return (self.correct, self.points, self.streak)
+
+@dataclass(frozen=True, slots=True)
+class PlayerSnapshot:
+    """Jogador dentro de um snapshot de Game (imutável; respostas em ordem de pergunta)"""
+    icon: str
+    score: int = 0
+    answers: Tuple[AnswerRecord, ...] = ()
+    joined_at: Optional[str] = None
+    session_id: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "PlayerSnapshot":
+        """Formato do blob legado games.players"""
+        answers = data.get("answers", [])
+        records = tuple(sorted(
+            (AnswerRecord.from_dict(a) for a in answers if isinstance(a, dict)) if isinstance(answers, list) else (),
+            key=lambda a: a.question
+        ))
+        return cls(icon=data.get("icon", "❓"), score=data.get("score", sum(a.points for a in records)),
+                   answers=records, joined_at=data.get("joined_at"), session_id=data.get("session_id"))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"icon": self.icon, "score": self.score, "answers": [a.to_dict() for a in self.answers],
+                "joined_at": self.joined_at, "session_id": self.session_id}
+
+    def answer_for(self, question: int) -> Optional[AnswerRecord]:
+        for answer in reversed(self.answers):
+            if answer.question == question:
+                return answer
+        return None
+
+    def current_streak(self) -> int:
+        streak = 0
+        for answer in reversed(self.answers):
+            if not answer.correct:
+                break
+            streak += 1
+        return streak
+
+    def with_answer(self, answer: AnswerRecord) -> "PlayerSnapshot":
+        return replace(self, score=self.score + answer.points, answers=self.answers + (answer,))
+
+@dataclass(frozen=True, slots=True)
+class QuestionStats:
+    """Agregado de uma pergunta (imutável, atualizado a cada resposta gravada):
+    respostas por opção, acertos e tempos de resposta ordenados (média/mediana em O(1))"""
+    option_counts: Tuple[int, ...] = ()
+    answered: int = 0
+    correct: int = 0
+    total_time_ms: int = 0
+    times_ms: Tuple[int, ...] = ()
+
+    @classmethod
+    def empty(cls, options: int) -> "QuestionStats":
+        return cls(option_counts=(0,) * options)
+
+    @classmethod
+    def from_answers(cls, options: int, answers) -> "QuestionStats":
+        """Monta de uma vez a partir de AnswerRecords (carga do banco, fechamento da pergunta)"""
+        counts = [0] * options
+        answered = correct = 0
+        times_ms = []
+        for answer in answers:
+            answered += 1
+            correct += answer.correct
+            if isinstance(answer.answer, int) and 0 <= answer.answer < options:
+                counts[answer.answer] += 1
+            if answer.time_ms is not None:
+                times_ms.append(answer.time_ms)
+        times_ms.sort()
+        return cls(tuple(counts), answered, correct, sum(times_ms), tuple(times_ms))
+
+    @property
+    def mean_time_ms(self) -> Optional[int]:
+        return self.total_time_ms // len(self.times_ms) if self.times_ms else None
+
+    @property
+    def median_time_ms(self) -> Optional[int]:
+        n = len(self.times_ms)
+        if not n:
+            return None
+        return self.times_ms[n // 2] if n % 2 else (self.times_ms[n // 2 - 1] + self.times_ms[n // 2]) // 2
+
+    def with_answer(self, answer: AnswerRecord) -> "QuestionStats":
+        counts = self.option_counts
+        if isinstance(answer.answer, int) and 0 <= answer.answer < len(counts):
+            counts = counts[:answer.answer] + (counts[answer.answer] + 1,) + counts[answer.answer + 1:]
+        times_ms, total_time_ms = self.times_ms, self.total_time_ms
+        if answer.time_ms is not None:
+            i = bisect.bisect(times_ms, answer.time_ms)
+            times_ms = times_ms[:i] + (answer.time_ms,) + times_ms[i:]
+            total_time_ms += answer.time_ms
+        return QuestionStats(counts, self.answered + 1, self.correct + answer.correct, total_time_ms, times_ms)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"option_counts": list(self.option_counts), "answered": self.answered, "correct": self.correct,
+                "mean_time_ms": self.mean_time_ms, "median_time_ms": self.median_time_ms}
+
+@dataclass(frozen=True, slots=True)
+class FrozenQuestionStats:
+    """Estatísticas gravadas em question_stats quando a pergunta fechou (do banco, com as
+    respostas de todos os processos): mesmas leituras de QuestionStats, já calculadas"""
+    option_counts: Tuple[int, ...] = ()
+    answered: int = 0
+    correct: int = 0
+    mean_time_ms: Optional[int] = None
+    median_time_ms: Optional[int] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "FrozenQuestionStats":
+        return cls(tuple(data.get("option_counts") or ()), data.get("answered", 0), data.get("correct", 0),
+                   data.get("mean_time_ms"), data.get("median_time_ms"))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"option_counts": list(self.option_counts), "answered": self.answered, "correct": self.correct,
+                "mean_time_ms": self.mean_time_ms, "median_time_ms": self.median_time_ms}
+
+class Leaderboard:
+    """Ranking incremental de um jogo.
+
+    Mantém pontuação e streak atual por jogador e um índice ordenado por
+    (-pontos, ordem de entrada): top-K é uma fatia e a posição de um jogador
+    sai de uma busca binária, sem reordenar a cada leitura.
+
+    Só quem escreve altera um Leaderboard, e antes de publicá-lo; entradas são
+    substituídas (nunca alteradas), então copy() é uma cópia rasa barata.
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._index: List[tuple] = []  # (-score, seq, name), sempre ordenado
+        self._next_seq = 0
+
+    @classmethod
+    def from_players(cls, players: Dict[str, PlayerSnapshot]) -> "Leaderboard":
+        """Constrói a partir dos jogadores (uma vez por linhagem de snapshots)"""
+        board = cls()
+        for name, player in players.items():
+            board.add_player(name, player.icon, player.score, player.current_streak())
+        return board
+
+    def add_player(self, name: str, icon: str, score: int = 0, streak: int = 0) -> None:
+        if name in self._entries:
+            return
+        entry = {"name": name, "icon": icon, "score": score, "streak": streak, "seq": self._next_seq}
+        self._next_seq += 1
+        self._entries[name] = entry
+        bisect.insort(self._index, (-score, entry["seq"], name))
+
+    def record_answer(self, name: str, points: int, is_correct: bool) -> None:
+        """Soma os pontos e atualiza o streak de uma resposta já gravada"""
+        entry = self._entries.get(name)
+        if entry is None:
+            return
+        updated = dict(entry, streak=entry["streak"] + 1 if is_correct else 0, score=entry["score"] + points)
+        self._entries[name] = updated
+        if points:
+            del self._index[self._position(entry)]
+            bisect.insort(self._index, (-updated["score"], updated["seq"], name))
+
+    def get_streak(self, name: str) -> int:
+        entry = self._entries.get(name)
+        return entry["streak"] if entry else 0
+
+    def top(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Ranking ordenado (todos ou só os limit primeiros)"""
+        keys = self._index if limit is None else self._index[:limit]
+        return [self._public(self._entries[name]) for _, _, name in keys]
+
+    def rank(self, name: str) -> Optional[int]:
+        """Posição 1-based do jogador, ou None se não está no jogo"""
+        entry = self._entries.get(name)
+        return self._position(entry) + 1 if entry else None
+
+    def copy(self) -> "Leaderboard":
+        """Cópia independente para o próximo snapshot"""
+        board = Leaderboard()
+        board._entries = dict(self._entries)
+        board._index = list(self._index)
+        board._next_seq = self._next_seq
+        return board
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _position(self, entry: Dict[str, Any]) -> int:
+        return bisect.bisect_left(self._index, (-entry["score"], entry["seq"], entry["name"]))
+
+    @staticmethod
+    def _public(entry: Dict[str, Any]) -> Dict[str, Any]:
+        return {"name": entry["name"], "icon": entry["icon"], "score": entry["score"], "streak": entry["streak"]}
+
+# Escritores de um mesmo jogo publicam snapshots em sequência (leitores nunca travam)
+_GAME_WRITE_LOCKS = [threading.Lock() for _ in range(64)]
+
+def _game_write_lock(code: str) -> threading.Lock:
+    return _GAME_WRITE_LOCKS[hash(code) % len(_GAME_WRITE_LOCKS)]
+
 class Game:
+    """Estado de um jogo.
+
+    Instâncias publicadas no game_cache são snapshots imutáveis compartilhados
+    entre sessões: jogadores são PlayerSnapshot num dict que nunca é alterado
+    depois de publicado. Escritas montam um sucessor a partir do snapshot mais
+    recente e o publicam atomicamente (game_cache.set); o objeto de quem chamou
+    só é atualizado se ainda não foi publicado. Para ler o estado novo, use
+    Game.get_by_code.
+    """
+
     def __init__(self, code, teacher_username, questions_json_str="[]", players_json_str="{}",
                  status="waiting", current_question=0, start_time=None, question_start_time=None,
-                 time_limit=20):
+                 time_limit=20, version=0, state_version=0, question_start_ms=None, question_deadline_ms=None,
+                 question_closed=False):
         self.code = code
         self.teacher_username = teacher_username
-        self._lock = threading.RLock()
 
         try:
             self.questions = json.loads(questions_json_str) if questions_json_str else []
@@ -539,36 +2387,95 @@ class Game:
             self.questions = []
 
         try:
-            self.players = json.loads(players_json_str) if players_json_str else {}
+            players = json.loads(players_json_str) if players_json_str else {}
         except json.JSONDecodeError:
-            self.players = {}
+            players = {}
+        self.players: Dict[str, PlayerSnapshot] = {
+            name: PlayerSnapshot.from_dict(data)
+            for name, data in (players.items() if isinstance(players, dict) else ()) if isinstance(data, dict)
+        }
 
         self.status = status
         self.current_question = current_question
         self.start_time = start_time
-        self.question_start_time = question_start_time
         self.time_limit = time_limit if time_limit else 20
-        self._last_save = datetime.now()
+        # Início e prazo da pergunta atual em epoch ms (question_start_time ISO só para linhas antigas)
+        self.question_start_ms = question_start_ms if question_start_ms is not None else _iso_to_ms(question_start_time)
+        self.question_deadline_ms = question_deadline_ms
+        if self.question_deadline_ms is None and self.question_start_ms is not None:
+            self.question_deadline_ms = self.question_start_ms + int(self.time_limit) * 1000
+        # Fechada pelo question_scheduler: respostas recusadas e estatísticas congeladas
+        self.question_closed = bool(question_closed)
+        # 0 = ainda não gravado; a linha em games começa em 1 e sobe a cada save
+        self.version = version
+        # Sobe a cada entrada, resposta, início, próxima pergunta e fim (não participa do CAS)
+        self.state_version = state_version
+        # Construído sob demanda a partir de players e copiado/atualizado a cada entrada/resposta
+        self._leaderboard: Optional[Leaderboard] = None
+        # Idem para os agregados por pergunta (question_stats)
+        self._question_stats: Optional[Dict[int, QuestionStats]] = None
+        # True depois de publicado no game_cache (somente leitura a partir daí)
+        self._published = False
 
     def _get_time_limit(self) -> float:
         return float(self.time_limit)
 
+    @property
+    def question_start_time(self) -> Optional[str]:
+        """Início da pergunta em ISO 8601 (coluna legada)"""
+        return _ms_to_iso(self.question_start_ms)
+
+    def elapsed_ms(self) -> int:
+        """Milissegundos desde o início da pergunta atual (0 se não começou)"""
+        if self.question_start_ms is None:
+            return 0
+        return question_clock.elapsed_ms(self.question_start_ms)
+
+    def remaining_ms(self) -> int:
+        """Milissegundos até o prazo da pergunta atual (0 se expirou)"""
+        if self.question_start_ms is None or self.question_deadline_ms is None:
+            return int(self.time_limit) * 1000
+        return max(0, self.question_deadline_ms - self.question_start_ms - self.elapsed_ms())
+
+    def is_expired(self) -> bool:
+        return self.question_start_ms is not None and self.remaining_ms() <= 0
+
+    def _start_question(self) -> None:
+        """Marca o início (e o prazo) da pergunta atual"""
+        self.question_start_ms = epoch_ms()
+        self.question_deadline_ms = self.question_start_ms + int(self.time_limit) * 1000
+        self.question_closed = False
+
+    @property
+    def phase(self) -> tuple:
+        """(status, pergunta, fechada): muda no início, próxima pergunta, fechamento e fim,
+        não a cada entrada ou resposta"""
+        return (self.status, self.current_question, self.question_closed)
+
+    def is_open(self, q_idx: int) -> bool:
+        """Jogo ativo na pergunta q_idx e ela ainda não foi fechada"""
+        return self.status == "active" and self.current_question == q_idx and not self.question_closed
+
     def to_dict_for_db(self):
         return {
             "code": self.code,
             "teacher_username": self.teacher_username,
             "questions": json.dumps(self.questions),
-            "players": json.dumps(self.players),
             "status": self.status,
             "current_question": self.current_question,
             "start_time": self.start_time,
             "question_start_time": self.question_start_time,
+            "question_start_ms": self.question_start_ms,
+            "question_deadline_ms": self.question_deadline_ms,
+            "question_closed": int(self.question_closed),
             "time_limit": self.time_limit,
+            "version": self.version,
             "updated_at": datetime.now().isoformat()
         }
 
     @classmethod
-    def from_db_row(cls, row):
+    def from_db_row(cls, row, players=None):
+        """players vem de game_players/game_answers; sem ele, usa o blob legado"""
         if not row:
             return None
         # time_limit pode não existir em DBs antigos
@@ -577,249 +2484,539 @@ class Game:
             tl = row["time_limit"] if row["time_limit"] else 20
         except (IndexError, KeyError):
             pass
-        return cls(
-            row["code"], row["teacher_username"], row["questions"], row["players"],
+        game = cls(
+            row["code"], row["teacher_username"], row["questions"],
+            row["players"] if players is None else "{}",
             row["status"], row["current_question"], row["start_time"], row["question_start_time"],
-            tl
+            tl, row["version"], row["state_version"], row["question_start_ms"], row["question_deadline_ms"],
+            row["question_closed"]
         )
+        if players is not None:
+            game.players = players
+        return game
 
-    def add_player(self, nickname, icon):
-        """Add player com idempotência - FIXED: race condition"""
-        operation_id = f"add_player:{self.code}:{nickname}"
-        
-        # Check deduplication
-        if dedup_cache.exists(operation_id):
+    def add_player(self, nickname, icon, session_id=None):
+        """Add player com idempotência: INSERT condicionado ao jogo estar em 'waiting'.
+
+        A PRIMARY KEY (jogo, apelido) decide no banco; se o apelido já existe com o
+        mesmo session_id (double-click, reload, outro processo), a entrada anterior
+        é confirmada e retorna True em vez de "apelido em uso".
+        """
+        operation_id = f"add_player:{self.code}:{nickname}:{session_id}"
+
+        # Camada da frente: entrada já confirmada para esta sessão
+        if session_id is not None and dedup_cache.get(operation_id):
             logger.info(f"Duplicate add_player detected: {nickname}")
-            return dedup_cache.get(operation_id)
-        
-        with DistributedLock(f"game:{self.code}", timeout=5):
-            # Reload from DB to get fresh state
-            fresh_game = Game.get_by_code(self.code)
-            if fresh_game:
-                self.players = fresh_game.players
-            
-            if nickname not in self.players:
-                self.players[nickname] = {
-                    "icon": icon,
-                    "score": 0,
-                    "answers": [],
-                    "joined_at": datetime.now().isoformat()
-                }
-                self._force_save()
+            return True
+
+        future = game_actors.submit(self.code, "join", nickname, icon, session_id) if ACTOR_MODE_ENABLED else None
+        if future is not None:
+            joined, snapshot = future.result(timeout=ANSWER_WRITE_TIMEOUT)
+            self._adopt(snapshot)
+            if joined and session_id is not None:
                 dedup_cache.set(operation_id, True)
-                logger.info(f"Player added: {nickname} to game {self.code}")
-                return True
-            
-            dedup_cache.set(operation_id, False)
+            return joined
+
+        game = Game.get_by_code(self.code) or self
+        existing = game.players.get(nickname)
+        if existing is not None:
+            joined = session_id is not None and existing.session_id == session_id
+            if joined:
+                dedup_cache.set(operation_id, True)
+            return joined
+
+        player = PlayerSnapshot(icon=icon, joined_at=datetime.now().isoformat(), session_id=session_id)
+        joined, state_version = self._insert_player(nickname, player)
+        if not joined:
             return False
 
-    def start_game(self):
-        with DistributedLock(f"game:{self.code}", timeout=5):
-            self.status = "active"
-            self.start_time = datetime.now().isoformat()
-            self.question_start_time = datetime.now().isoformat()
-            self._force_save()
-            logger.info(f"Game started: {self.code}")
-
-    def next_question(self):
-        with DistributedLock(f"game:{self.code}", timeout=5):
-            if self.current_question < len(self.questions) - 1:
-                self.current_question += 1
-                self.question_start_time = datetime.now().isoformat()
-                self._force_save()
-                logger.info(f"Next question: {self.code} Q{self.current_question}")
+        if state_version is not None:
+            self._publish(lambda draft: draft._add_player(nickname, player, state_version))
+            logger.info(f"Player added: {nickname} to game {self.code}")
+        dedup_cache.set(operation_id, True)
+        return True
+
+    def start_game(self, time_limit=None):
+        def apply(game):
+            if time_limit:
+                game.time_limit = time_limit
+            game.status = "active"
+            game.start_time = datetime.now().isoformat()
+            game._start_question()
+
+        self._mutate("start_game", apply)
+        question_scheduler.schedule_close(Game.get_by_code(self.code))
+        logger.info(f"Game started: {self.code}")
+
+    def next_question(self, expected_q: Optional[int] = None):
+        """Avança para a próxima pergunta (ou finaliza o jogo na última).
+        Com expected_q, só avança se o jogo ainda está nessa pergunta: um clique
+        repetido ou o auto-avanço atrasado não pulam perguntas. Retorna True se
+        avançou, False se finalizou e None se o jogo já tinha saído de expected_q."""
+        def apply(game):
+            if expected_q is not None and game.current_question != expected_q:
+                return None
+            if game.current_question < len(game.questions) - 1:
+                game.current_question += 1
+                game._start_question()
                 return True
-            else:
-                self.status = "finished"
-                self._force_save()
-                logger.info(f"Game finished: {self.code}")
+            game.status = "finished"
+            return False
+
+        advanced = self._mutate("next_question", apply, unchanged=None)
+        if advanced is None:
+            logger.info(f"Next question skipped: {self.code} already left Q{expected_q}")
+        elif advanced:
+            current = Game.get_by_code(self.code)
+            question_scheduler.schedule_close(current)
+            logger.info(f"Next question: {self.code} Q{current.current_question if current else '?'}")
+        else:
+            GameResults.materialize(self.code)
+            logger.info(f"Game finished: {self.code}")
+        return advanced
+
+    def finish_game(self):
+        def apply(game):
+            game.status = "finished"
+
+        self._mutate("finish_game", apply)
+        GameResults.materialize(self.code)
+        logger.info(f"Game finished: {self.code}")
+
+    def close_question(self, q_idx: int) -> bool:
+        """Fecha a pergunta q_idx quando o prazo acaba: novas respostas são recusadas
+        (também no banco) e as estatísticas da pergunta são congeladas em question_stats.
+        Idempotente: retorna False se o jogo já saiu da pergunta ou ela já foi fechada."""
+        game = Game.get_by_code(self.code) or self
+        if not game.is_open(q_idx):
+            return False
+
+        def apply(game):
+            if not game.is_open(q_idx):
                 return False
+            game.question_closed = True
+            return True
+
+        closed = self._mutate("close_question", apply)
+        if closed:
+            self._freeze_question_stats(q_idx)
+            logger.info(f"Question closed: {self.code} Q{q_idx}")
+        return closed
 
     def record_answer(self, player_name, answer_index, time_taken=None):
         """Record answer com scoring estilo Kahoot (streak bonus + time-based).
-        time_taken é calculado pelo servidor via question_start_time."""
-        if self.question_start_time:
-            try:
-                q_start = datetime.fromisoformat(self.question_start_time)
-                time_taken = (datetime.now() - q_start).total_seconds()
-            except (ValueError, TypeError):
-                pass
+        time_taken é calculado pelo servidor (elapsed_ms da pergunta), no momento
+        em que a resposta chega (antes de entrar na fila do answer_writer)."""
+        game = Game.get_by_code(self.code) or self
+        q_idx = game.current_question
+
+        if game.question_start_ms is not None:
+            time_taken = game.elapsed_ms() / 1000
         if time_taken is None:
             time_taken = 9999
-        operation_id = f"answer:{self.code}:{player_name}:{self.current_question}"
+        operation_id = f"answer:{self.code}:{player_name}:{q_idx}"
 
-        # Check deduplication (previne double-click)
-        if dedup_cache.exists(operation_id):
-            result = dedup_cache.get(operation_id)
+        # Camada da frente (previne double-click): só resultados já gravados
+        result = dedup_cache.get(operation_id)
+        if result is not None:
             logger.info(f"Duplicate answer detected: {player_name}")
-            return result if result else (None, 0, 0)
-
-        with DistributedLock(f"game:{self.code}:player:{player_name}", timeout=5):
-            # Reload fresh state
-            fresh_game = Game.get_by_code(self.code)
-            if fresh_game:
-                self.players = fresh_game.players
-
-            if (player_name not in self.players or
-                self.current_question >= len(self.questions) or
-                self.status != "active"):
-                result = (None, 0, 0)
-                dedup_cache.set(operation_id, result)
-                return result
+            return result
 
-            # Verificar se já respondeu esta pergunta
-            player_data = self.players[player_name]
-            if not isinstance(player_data, dict):
-                result = (None, 0, 0)
+        future = (game_actors.submit(self.code, "answer", player_name, q_idx, answer_index, time_taken)
+                  if ACTOR_MODE_ENABLED else None)
+        if future is not None:
+            # O dono do jogo valida, pontua e grava em sequência: sem recarregar nem travar
+            result, snapshot = future.result(timeout=ANSWER_WRITE_TIMEOUT)
+            self._adopt(snapshot)
+            if result[0] is not None:
                 dedup_cache.set(operation_id, result)
-                return result
+            return result
 
-            answers = player_data.get("answers", [])
-            if any(ans.get("question") == self.current_question for ans in answers):
-                result = (None, 0, 0)
-                dedup_cache.set(operation_id, result)
-                return result
+        if not game._can_answer(player_name, q_idx):
+            # Já respondida: devolve o resultado anterior em vez de rejeitar
+            player = game.players.get(player_name)
+            prior = player.answer_for(q_idx) if player else None
+            if prior is None:
+                return (None, 0, 0)
+            result = prior.result()
+            dedup_cache.set(operation_id, result)
+            return result
 
-            # Calcular pontos estilo Kahoot
-            correct_answer_idx = self.questions[self.current_question]["correct"]
-            is_correct = (answer_index == correct_answer_idx)
-
-            # Calcular streak (sequência de acertos consecutivos)
-            streak = 0
-            if is_correct:
-                sorted_answers = sorted(answers, key=lambda a: a.get("question", 0))
-                for ans in reversed(sorted_answers):
-                    if ans.get("correct"):
-                        streak += 1
-                    else:
-                        break
-                streak += 1  # inclui a resposta atual
-
-            # Pontuação Kahoot: base 1000 pontos, time decay linear, streak bonus
-            # Se tempo > limite: ZERO pontos mesmo acertando
-            time_limit = self._get_time_limit()
-            points = 0
-            if is_correct and time_taken <= time_limit:
-                # Fórmula Kahoot: pontos = base * (1 - (time / limit) / 2)
-                time_factor = 1.0 - (min(time_taken, time_limit) / time_limit) / 2.0
-                base_points = int(1000 * time_factor)
-                base_points = max(500, base_points)
-
-                # Streak bonus: +100 por acerto consecutivo (cap 500)
-                streak_bonus = min((streak - 1) * 100, 500)
-                points = base_points + streak_bonus
-
-            # Garantir que 'answers' existe e é uma lista
-            if "answers" not in self.players[player_name] or not isinstance(self.players[player_name]["answers"], list):
-                self.players[player_name]["answers"] = []
-
-            self.players[player_name]["answers"].append({
-                "question": self.current_question,
-                "answer": answer_index,
-                "correct": is_correct,
-                "time": round(time_taken, 2),
-                "points": points,
-                "streak": streak,
-                "timestamp": datetime.now().isoformat()
-            })
-            self.players[player_name]["score"] += points
-
-            self._force_save()
-
-            result = (is_correct, points, streak)
+        if GROUP_COMMIT_ENABLED:
+            # Group commit: o writer grava todas as respostas pendentes do jogo numa transação
+            future = answer_writer.submit(self.code, player_name, q_idx, answer_index, time_taken)
+            result = future.result(timeout=ANSWER_WRITE_TIMEOUT)
+        else:
+            answer = game._score_answer(player_name, q_idx, answer_index, time_taken)
+            # Um único INSERT condicionado ao estado do jogo (ativo e na mesma pergunta):
+            # dispensa lock, e a UNIQUE (jogo, jogador, pergunta) barra duplicatas entre processos
+            state_version, prior = self._insert_answer(player_name, answer)
+            if state_version is not None:
+                self._apply_answers({player_name: answer}, state_version)
+                result = answer.result()
+            else:
+                result = prior or (None, 0, 0)
+
+        if result[0] is not None:
             dedup_cache.set(operation_id, result)
-            logger.info(f"Answer recorded: {player_name} Q{self.current_question} correct={is_correct} points={points} streak={streak}")
+        is_correct, points, streak = result
+        logger.info(f"Answer recorded: {player_name} Q{q_idx} correct={is_correct} points={points} streak={streak}")
+        return result
+
+    def _can_answer(self, player_name, q_idx) -> bool:
+        """Jogador existe, jogo ativo nesta pergunta (ainda aberta) e ainda não respondida"""
+        player = self.players.get(player_name)
+        if player is None or q_idx >= len(self.questions) or self.status != "active" or self.question_closed:
+            return False
+        return player.answer_for(q_idx) is None
+
+    def _score_answer(self, player_name, q_idx, answer_index, time_taken) -> AnswerRecord:
+        """Monta a resposta pontuada (sem gravar)"""
+        correct_answer_idx = self.questions[q_idx]["correct"]
+        is_correct = (answer_index == correct_answer_idx)
+
+        # Streak (sequência de acertos consecutivos), incluindo a resposta atual
+        streak = self.get_leaderboard().get_streak(player_name) + 1 if is_correct else 0
+
+        return AnswerRecord(
+            question=q_idx,
+            answer=answer_index,
+            correct=is_correct,
+            time_ms=int(round(time_taken * 1000)),
+            points=calculate_points(is_correct, time_taken, self._get_time_limit(), streak),
+            streak=streak,
+            answered_at_ms=int(time.time() * 1000)
+        )
+
+    def _apply_answers(self, answers: Dict[str, AnswerRecord], state_version: Optional[int] = None) -> "Game":
+        """Publica um snapshot com respostas já gravadas"""
+        return self._publish(lambda draft: draft._add_answers(answers, state_version))
+
+    def _add_player(self, nickname: str, player: PlayerSnapshot, state_version: Optional[int]) -> None:
+        """Em um rascunho: inclui o jogador (copy-on-write de players e do ranking)"""
+        if nickname in self.players:
+            return
+        self.players = dict(self.players)
+        self.players[nickname] = player
+        self._leaderboard = self.get_leaderboard().copy()
+        self._leaderboard.add_player(nickname, player.icon)
+        self._observe_state_version(state_version)
+
+    def _add_answers(self, answers: Dict[str, AnswerRecord], state_version: Optional[int]) -> None:
+        """Em um rascunho: inclui respostas (copy-on-write de players e do ranking)"""
+        players = dict(self.players)
+        board = self.get_leaderboard().copy()
+        stats = dict(self._get_question_stats())
+        for name, answer in answers.items():
+            player = players.get(name)
+            if player is None or player.answer_for(answer.question) is not None:
+                continue
+            players[name] = player.with_answer(answer)
+            board.record_answer(name, answer.points, answer.correct)
+            stats[answer.question] = self._stats_entry(stats, answer.question).with_answer(answer)
+        self.players = players
+        self._leaderboard = board
+        self._question_stats = stats
+        self._observe_state_version(state_version)
+
+    def _copy_row(self, other: "Game") -> None:
+        """Em um rascunho: adota os campos da linha de games de other"""
+        self.teacher_username = other.teacher_username
+        self.status = other.status
+        self.current_question = other.current_question
+        self.start_time = other.start_time
+        self.question_start_ms = other.question_start_ms
+        self.question_deadline_ms = other.question_deadline_ms
+        self.question_closed = other.question_closed
+        self.time_limit = other.time_limit
+        self.version = other.version
+        self._observe_state_version(other.state_version)
+
+    def _evolve(self) -> "Game":
+        """Rascunho não publicado que compartilha tudo com self (quem altera substitui, não muta)"""
+        draft = object.__new__(Game)
+        draft.__dict__.update(self.__dict__)
+        draft._published = False
+        return draft
+
+    def _publish(self, update) -> "Game":
+        """Aplica update(rascunho) sobre o snapshot mais recente e o publica atomicamente.
+        update deve ser idempotente (a base pode já conter a escrita)"""
+        key = f"game:{self.code}"
+        with _game_write_lock(self.code):
+            # Sem snapshot em cache, a base vem do banco (que já inclui esta escrita)
+            base = game_cache.get(key) or Game._load_by_code(self.code) or self
+            draft = base._evolve()
+            update(draft)
+            draft._published = True
+            game_cache.set(key, draft, successor=True)
+        game_event_bus.publish(self.code, draft.state_version, draft.phase)
+        self._adopt(draft)
+        return draft
+
+    @staticmethod
+    def _cacheable(game: Optional["Game"]) -> Optional["Game"]:
+        """Jogo recém-carregado do banco que vai para o game_cache: vira snapshot
+        publicado (compartilhado entre sessões, escritas usam rascunhos)"""
+        if game is not None:
+            game._published = True
+        return game
+
+    def _snapshot(self) -> "Game":
+        """Snapshot publicável do estado privado de um GameActor (que altera players
+        e o ranking no lugar): copia os dois, o resto é compartilhado"""
+        snapshot = self._evolve()
+        snapshot.players = dict(self.players)
+        snapshot._leaderboard = self._leaderboard.copy() if self._leaderboard is not None else None
+        snapshot._question_stats = dict(self._question_stats) if self._question_stats is not None else None
+        snapshot._published = True
+        return snapshot
+
+    def _adopt(self, other: "Game") -> None:
+        """Passa a refletir o estado de other, se self ainda não foi publicado"""
+        if self._published or other is self:
+            return
+        self._copy_row(other)
+        self.players = other.players
+        self._leaderboard = other._leaderboard
+        self._question_stats = other._question_stats
+
+    def _observe_state_version(self, state_version: Optional[int]) -> None:
+        # Escritas concorrentes podem ser aplicadas fora de ordem: nunca regride
+        if state_version is not None:
+            self.state_version = max(self.state_version, state_version)
+
+    def get_leaderboard(self) -> Leaderboard:
+        # Construção idempotente: duas threads podem montar o mesmo ranking, sem lock
+        board = self._leaderboard
+        if board is None:
+            board = self._leaderboard = Leaderboard.from_players(self.players)
+        return board
+
+    def _get_question_stats(self) -> Dict[int, QuestionStats]:
+        # Mesma ideia do ranking: montado uma vez a partir de players, depois só incrementos
+        stats = self._question_stats
+        if stats is None:
+            by_question: Dict[int, List[AnswerRecord]] = {}
+            for player in self.players.values():
+                for answer in player.answers:
+                    by_question.setdefault(answer.question, []).append(answer)
+            stats = self._question_stats = {
+                q_idx: QuestionStats.from_answers(self._option_count(q_idx), answers)
+                for q_idx, answers in by_question.items()
+            }
+        return stats
+
+    def _option_count(self, q_idx: int) -> int:
+        return len(self.questions[q_idx].get("options", [])) if 0 <= q_idx < len(self.questions) else 0
+
+    def _stats_entry(self, stats: Dict[int, QuestionStats], q_idx: int) -> QuestionStats:
+        entry = stats.get(q_idx)
+        return entry if entry is not None else QuestionStats.empty(self._option_count(q_idx))
+
+    def question_stats(self, q_idx: int):
+        """Respostas por opção, acertos e tempo médio/mediano da pergunta q_idx (O(1)).
+        Pergunta já fechada: as estatísticas congeladas no fechamento, se existem"""
+        if self._is_past(q_idx):
+            frozen = Game.frozen_question_stats(self.code).get(q_idx)
+            if frozen is not None:
+                return frozen
+        return self._stats_entry(self._get_question_stats(), q_idx)
+
+    def _is_past(self, q_idx: int) -> bool:
+        """Pergunta que não recebe mais respostas (fechada, já passou ou jogo terminado)"""
+        return (q_idx < self.current_question or self.status == "finished" or
+                (q_idx == self.current_question and self.question_closed))
+
+    @classmethod
+    def frozen_question_stats(cls, code: str) -> Dict[int, FrozenQuestionStats]:
+        """Estatísticas congeladas das perguntas fechadas do jogo (uma consulta a cada
+        poucos segundos por jogo; o fechamento feito neste processo invalida na hora)"""
+        def load():
+            return {q_idx: FrozenQuestionStats.from_dict(data)
+                    for q_idx, data in game_store.get_question_stats(code).items()}
+        try:
+            return results_cache.get_or_load(f"question_stats:{code}", load, ttl=game_cache.default_ttl) or {}
+        except Exception as e:
+            logger.warning(f"Failed to load frozen question stats for {code}: {e}")
+            return {}
+
+    def get_ranking(self, limit: Optional[int] = None):
+        """Ranking ordenado por pontos (dicts com name, icon, score, streak)"""
+        return self.get_leaderboard().top(limit)
+
+    def get_player_rank(self, player_name) -> Optional[int]:
+        """Posição 1-based do jogador no ranking (None se não está no jogo)"""
+        return self.get_leaderboard().rank(player_name)
+
+    def _mutate(self, operation: str, apply, max_attempts: int = 5, unchanged: Any = False):
+        """Aplica apply(game) e grava com compare-and-swap; em conflito recarrega a
+        linha de games e reaplica, sem precisar de lock.
+        Se apply retorna unchanged (no-op), nada é gravado nem publicado.
+        No modo actor, apply roda no dono do jogo e self adota o snapshot publicado."""
+        future = (game_actors.submit(self.code, "mutate", operation, apply, unchanged)
+                  if ACTOR_MODE_ENABLED else None)
+        if future is not None:
+            result, snapshot = future.result(timeout=ANSWER_WRITE_TIMEOUT)
+            self._adopt(snapshot)
             return result
 
-    def get_ranking(self):
-        with self._lock:
-            if not isinstance(self.players, dict):
-                return []
-
-            ranking = []
-            for name, data in self.players.items():
-                if isinstance(data, dict):
-                    # Calcular streak atual do jogador
-                    answers = data.get("answers", [])
-                    current_streak = 0
-                    for ans in reversed(sorted(answers, key=lambda a: a.get("question", 0))):
-                        if ans.get("correct"):
-                            current_streak += 1
-                        else:
-                            break
-                    ranking.append({
-                        "name": name,
-                        "icon": data.get("icon", "❓"),
-                        "score": data.get("score", 0),
-                        "streak": current_streak
-                    })
-            return sorted(ranking, key=lambda x: x["score"], reverse=True)
-
-    def _force_save(self):
-        """Força salvamento imediato"""
+        # Rascunho privado: leitores só veem o resultado depois de gravado e publicado
+        draft = self._evolve()
+        for attempt in range(max_attempts):
+            result = apply(draft)
+            if result is unchanged:
+                # No-op: não incrementa version nem acorda long-polls
+                return result
+            try:
+                self._adopt(draft.save())
+                game_write_stats.record(operation)
+                return result
+            except GameVersionConflict:
+                exhausted = attempt == max_attempts - 1
+                game_write_stats.record(operation, conflicted=True, exhausted=exhausted)
+                logger.info(f"Version conflict on {operation} for game {self.code} (attempt {attempt+1})")
+                if exhausted or not draft._reload_row():
+                    raise
+                time.sleep(random.uniform(0, 0.005 * (attempt + 1)))
+
+    def save(self) -> "Game":
+        """Save com write-through cache (apenas a linha de games; jogadores e
+        respostas são gravados por add_player/record_answer nas próprias tabelas).
+        Compare-and-swap pela coluna version: levanta GameVersionConflict se a
+        linha mudou desde a última leitura. Retorna o snapshot publicado."""
         try:
-            self.save()
-            self._last_save = datetime.now()
+            # Um snapshot publicado não é alterado: a gravação usa um rascunho
+            draft = self._evolve() if self._published else self
+            if draft.version == 0:
+                draft._insert_row()
+            elif not draft._update_row():
+                raise GameVersionConflict(f"Game {self.code} changed (expected version {self.version})")
+
+            return self._publish(lambda latest: latest._copy_row(draft))
+        except GameVersionConflict:
+            raise
         except Exception as e:
             logger.error(f"Failed to save game {self.code}: {e}")
+            raise
 
     @retry_db_operation()
-    def save(self):
-        """Save com write-through cache"""
+    def _insert_row(self):
+        data = self.to_dict_for_db()
+        data["version"] = 1
+        game_store.insert_game(data)
+        self.version = 1
+        self.state_version = 1
+
+    @retry_db_operation()
+    def _update_row(self) -> bool:
+        state_version = game_store.update_game(self.to_dict_for_db())
+        if state_version is None:
+            return False
+        self.version += 1
+        self._observe_state_version(state_version)
+        return True
+
+    @retry_db_operation()
+    def _reload_row(self) -> bool:
+        """Recarrega só a linha de games (sem jogadores/respostas) após um conflito"""
+        row = game_store.get_game_row(self.code)
+        if not row:
+            return False
+        self.teacher_username = row["teacher_username"]
+        self.status = row["status"]
+        self.current_question = row["current_question"]
+        self.start_time = row["start_time"]
+        self.time_limit = row["time_limit"] or 20
+        self.question_start_ms = row["question_start_ms"]
+        if self.question_start_ms is None:
+            self.question_start_ms = _iso_to_ms(row["question_start_time"])
+        self.question_deadline_ms = row["question_deadline_ms"]
+        self.question_closed = bool(row["question_closed"])
+        self.version = row["version"]
+        self._observe_state_version(row["state_version"])
+        return True
+
+    @retry_db_operation()
+    def _insert_player(self, nickname, player: PlayerSnapshot) -> Tuple[bool, Optional[int]]:
+        """Retorna (entrou, novo state_version).
+
+        (True, None) quando o apelido já pertence à mesma sessão; (False, None)
+        se o apelido é de outra sessão ou o jogo já começou.
+        """
+        return game_store.add_player(self.code, nickname, player)
+
+    @retry_db_operation()
+    def _insert_answer(self, player_name, answer: AnswerRecord) -> Tuple[Optional[int], Optional[tuple]]:
+        """Retorna (novo state_version, None) se a resposta foi aceita, ou
+        (None, resultado anterior) quando o jogador já tinha respondido a pergunta"""
+        return game_store.add_answer(self.code, player_name, answer)
+
+    @retry_db_operation()
+    def _freeze_question_stats(self, q_idx: int) -> None:
+        """Grava as estatísticas finais da pergunta (uma vez; a pergunta já está fechada)"""
+        game_store.freeze_question_stats(self.code, q_idx, self._option_count(q_idx))
+        results_cache.delete(f"question_stats:{self.code}")
+
+    @staticmethod
+    def find_stale_cached(cached: Dict[str, 'Game']) -> set:
+        """Validator de cache: chaves cujo jogo tem outro state_version (ou sumiu) no banco"""
+        by_code = {game.code: key for key, game in cached.items()}
+        current = game_store.state_versions(list(by_code))
+        return {key for code, key in by_code.items() if current.get(code) != cached[key].state_version}
+
+    @classmethod
+    def get_phase(cls, code) -> Optional[tuple]:
+        """Fase atual do jogo sem bloquear: do game_event_bus (sem consulta) ou, com
+        vários processos ou antes da primeira publicação, do snapshot em cache"""
+        phase = None if game_event_bus.multi_process else game_event_bus.phase(code)
+        if phase is None:
+            game = cls.get_by_code(code)
+            phase = game.phase if game else None
+        return phase
+
+    @classmethod
+    def get_state_version(cls, code) -> Optional[int]:
+        """Versão de estado do jogo direto da linha de games (sem carregar perguntas/jogadores)"""
         try:
-            with get_db_connection() as conn:
-                cursor = conn.cursor()
-                data = self.to_dict_for_db()
-                cursor.execute('''
-                INSERT OR REPLACE INTO games
-                (code, teacher_username, questions, players, status, current_question, start_time, question_start_time, time_limit, updated_at)
-                VALUES (:code, :teacher_username, :questions, :players, :status, :current_question, :start_time, :question_start_time, :time_limit, :updated_at)
-                ''', data)
-
-            game_cache.set(f"game:{self.code}", self)
+            return game_store.state_versions([code]).get(code)
         except Exception as e:
-            logger.error(f"Failed to save game {self.code}: {e}")
-            raise
+            logger.warning(f"State version probe failed for {code}: {e}")
+            return None
 
     @classmethod
     @retry_db_operation()
     def get_by_code(cls, code):
-        # Check cache first
-        cached = game_cache.get(f"game:{code}")
-        if cached:
-            return cached
-        
+        # Modo actor: o snapshot publicado pelo dono do jogo já é o estado mais recente
+        snapshot = game_actors.snapshot(code) if ACTOR_MODE_ENABLED else None
+        if snapshot is not None:
+            return snapshot
+        # Single-flight: com o cache expirado, só um leitor por código vai ao SQLite
+        return game_cache.get_or_load(f"game:{code}", lambda: cls._cacheable(cls._load_by_code(code)))
+
+    @classmethod
+    def _load_by_code(cls, code):
         try:
-            with get_db_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT * FROM games WHERE code = ?", (code,))
-                row = cursor.fetchone()
-                game = cls.from_db_row(row)
-                
-                if game:
-                    game_cache.set(f"game:{code}", game)
-                
-                return game
+            loaded = game_store.load_games([code]).get(code)
+            game = cls.from_db_row(*loaded) if loaded else None
         except Exception as e:
             logger.error(f"Failed to get game {code}: {e}")
             return None
+        # Jogo ativo visto por este processo (inclusive após reinício): garante o fechamento
+        # no prazo e, com a pergunta já fechada, o auto-avanço pendente
+        question_scheduler.resume(game)
+        return game
     
     @classmethod
     @retry_db_operation()
     def get_by_teacher(cls, teacher_username):
         try:
-            with get_db_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT * FROM games WHERE teacher_username = ? ORDER BY created_at DESC", (teacher_username,))
-                rows = cursor.fetchall()
-                games = [cls.from_db_row(row) for row in rows]
-                
-                # Add to cache
-                for game in games:
-                    if game:
-                        game_cache.set(f"game:{game.code}", game)
-                
-                return games
+            games = []
+            for row, players in game_store.load_teacher_games(teacher_username):
+                game = cls._cacheable(cls.from_db_row(row, players))
+                # Sem substituir um snapshot mais novo publicado durante a leitura
+                games.append(game_cache.set(f"game:{game.code}", game, keep_newer=True))
+            return games
         except Exception as e:
             logger.error(f"Failed to get games for teacher {teacher_username}: {e}")
             return []
@@ -827,41 +3024,608 @@ class Game:
     @classmethod
     @retry_db_operation()
     def get_multiple_by_codes(cls, codes: List[str]) -> Dict[str, 'Game']:
-        """Batch fetch para reduzir N+1 queries - NEW"""
+        """Batch fetch para reduzir N+1 queries, com single-flight por código"""
         if not codes:
             return {}
-        
-        # Check cache first
-        result = {}
-        missing_codes = []
-        
-        for code in codes:
-            cached = game_cache.get(f"game:{code}")
-            if cached:
-                result[code] = cached
-            else:
-                missing_codes.append(code)
-        
-        if not missing_codes:
-            return result
-        
+
+        keys = {f"game:{code}": code for code in codes}
+
+        def load(missing_keys):
+            games = cls._load_many([keys[key] for key in missing_keys])
+            return {f"game:{code}": cls._cacheable(game) for code, game in games.items()}
+
+        cached = game_cache.get_or_load_many(list(keys), load)
+        return {keys[key]: game for key, game in cached.items()}
+
+    @classmethod
+    def _load_many(cls, codes: List[str]) -> Dict[str, 'Game']:
         try:
-            with get_db_connection() as conn:
-                cursor = conn.cursor()
-                placeholders = ','.join('?' * len(missing_codes))
-                query = f"SELECT * FROM games WHERE code IN ({placeholders})"
-                cursor.execute(query, missing_codes)
-                
-                for row in cursor:
-                    game = cls.from_db_row(row)
-                    if game:
-                        result[game.code] = game
-                        game_cache.set(f"game:{game.code}", game)
-                
-                return result
+            return {code: cls.from_db_row(row, players) for code, (row, players) in game_store.load_games(codes).items()}
         except Exception as e:
             logger.error(f"Failed to batch get games: {e}")
-            return result
+            return {}
+
+# ==================== GAME RESULTS ====================
+@dataclass(frozen=True)
+class GameResults:
+    """Resultado final de um jogo: ranking, estatísticas por pergunta e resumo por
+    jogador. Calculado uma única vez quando o jogo termina e gravado em game_results;
+    a página de resultados só lê daqui (sem remontar ranking a cada reload)."""
+    code: str
+    ranking: Tuple[Dict[str, Any], ...]
+    question_stats: Tuple[Dict[str, Any], ...]
+    player_summaries: Dict[str, Dict[str, Any]]
+    finished_at_ms: Optional[int] = None
+
+    @classmethod
+    def from_game(cls, game: Game) -> "GameResults":
+        ranking = tuple(game.get_ranking())
+        summaries = {}
+        for rank, entry in enumerate(ranking, 1):
+            answers = game.players[entry["name"]].answers
+            times_ms = [a.time_ms for a in answers if a.time_ms is not None]
+            summaries[entry["name"]] = {
+                "rank": rank,
+                "score": entry["score"],
+                "answered": len(answers),
+                "correct": sum(1 for a in answers if a.correct),
+                "avg_time_ms": sum(times_ms) // len(times_ms) if times_ms else None,
+                "best_streak": max((a.streak for a in answers), default=0),
+            }
+        return cls(
+            code=game.code,
+            ranking=ranking,
+            question_stats=tuple(game.question_stats(q_idx).to_dict() for q_idx in range(len(game.questions))),
+            player_summaries=summaries,
+            finished_at_ms=epoch_ms()
+        )
+
+    @classmethod
+    def from_row(cls, row) -> "GameResults":
+        return cls(
+            code=row["game_code"],
+            ranking=tuple(json.loads(row["ranking"])),
+            question_stats=tuple(json.loads(row["question_stats"])),
+            player_summaries=json.loads(row["player_summaries"]),
+            finished_at_ms=row["finished_at_ms"]
+        )
+
+    def to_row(self) -> Dict[str, Any]:
+        """Linha de game_results"""
+        return {
+            "game_code": self.code,
+            "ranking": json.dumps(list(self.ranking)),
+            "question_stats": json.dumps(list(self.question_stats)),
+            "player_summaries": json.dumps(self.player_summaries),
+            "finished_at_ms": self.finished_at_ms
+        }
+
+    def rank_of(self, player_name) -> Optional[int]:
+        """Posição 1-based do jogador (None se não participou)"""
+        summary = self.player_summaries.get(player_name)
+        return summary["rank"] if summary else None
+
+    @classmethod
+    def materialize(cls, code: str) -> Optional["GameResults"]:
+        """Calcula e grava o resultado de um jogo terminado (uma vez: o primeiro grava,
+        os demais leem o gravado). Falhas só são registradas: get_by_code tenta de novo."""
+        try:
+            results = cls._load(code)
+            if results is not None:
+                results_cache.set(f"results:{code}", results)
+            return results
+        except Exception as e:
+            logger.error(f"Failed to materialize results for game {code}: {e}")
+            return None
+
+    @classmethod
+    def get_by_code(cls, code: str) -> Optional["GameResults"]:
+        """Resultado final do jogo (None se não existe ou ainda não terminou)"""
+        return results_cache.get_or_load(f"results:{code}", lambda: cls._load(code))
+
+    @classmethod
+    @retry_db_operation()
+    def _load(cls, code: str) -> Optional["GameResults"]:
+        row = game_store.get_results(code)
+        if row is not None:
+            return cls.from_row(row)
+
+        # Do banco (e não do cache): todas as respostas gravadas, de qualquer processo
+        game = Game._load_by_code(code)
+        if game is None or game.status != "finished":
+            return None
+        # Grava só se ninguém gravou antes (outro processo): todos devolvem o mesmo registro
+        row = game_store.insert_results(cls.from_game(game).to_row())
+        logger.info(f"Results materialized for game {code}")
+        return cls.from_row(row)
+
+# ==================== ANSWER WRITER (GROUP COMMIT) ====================
+GROUP_COMMIT_ENABLED = _get_secret("ARYROOT_GROUP_COMMIT", "1").strip().lower() in ("1", "true", "yes")
+ANSWER_FLUSH_INTERVAL = float(_get_secret("ARYROOT_ANSWER_FLUSH_MS", "5")) / 1000.0
+ANSWER_WRITE_TIMEOUT = 15.0
+
+class _PendingAnswer:
+    __slots__ = ("code", "nickname", "question", "answer_index", "time_taken", "future")
+
+    def __init__(self, code, nickname, question, answer_index, time_taken):
+        self.code = code
+        self.nickname = nickname
+        self.question = question
+        self.answer_index = answer_index
+        self.time_taken = time_taken
+        self.future = Future()
+
+class AnswerWriter:
+    """Ingestão de respostas com group commit.
+
+    record_answer enfileira a resposta e espera um Future; uma thread gravadora
+    acumula a fila por alguns milissegundos e grava todas as respostas pendentes
+    de cada jogo numa única transação (BEGIN IMMEDIATE + executemany). Com
+    shards, os jogos de arquivos diferentes são gravados em paralelo.
+    """
+
+    def __init__(self, flush_interval: float = 0.005, max_batch: int = 2000):
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._queue: List[_PendingAnswer] = []
+        self._lock = threading.RLock()
+        self._not_empty = threading.Condition(self._lock)
+        self._thread = None
+        self._shard_executor: Optional[ThreadPoolExecutor] = None
+        self._metrics = {'batches': 0, 'answers': 0, 'rejected': 0, 'errors': 0, 'max_batch_size': 0}
+
+    def submit(self, code: str, nickname: str, question: int, answer_index, time_taken: float) -> Future:
+        """Enfileira uma resposta; o Future resolve para (is_correct, points, streak)"""
+        item = _PendingAnswer(code, nickname, question, answer_index, time_taken)
+        with self._lock:
+            self._queue.append(item)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="answer-writer", daemon=True)
+                self._thread.start()
+            self._not_empty.notify()
+        return item.future
+
+    def get_metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics['pending'] = len(self._queue)
+        metrics['avg_batch_size'] = round(metrics['answers'] / metrics['batches'], 2) if metrics['batches'] else 0.0
+        return metrics
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                while not self._queue:
+                    self._not_empty.wait()
+            # Janela de agrupamento: respostas que chegam durante o intervalo entram no mesmo commit
+            time.sleep(self.flush_interval)
+            with self._lock:
+                batch = self._queue[:self.max_batch]
+                del self._queue[:self.max_batch]
+
+            by_game: Dict[str, List[_PendingAnswer]] = {}
+            for item in batch:
+                by_game.setdefault(item.code, []).append(item)
+            by_shard = db_shards.group_codes(list(by_game))
+            if len(by_shard) > 1:
+                # Cada shard tem o próprio lock de escrita: um flush por arquivo, em paralelo
+                if self._shard_executor is None:
+                    self._shard_executor = ThreadPoolExecutor(max_workers=db_shards.shard_count,
+                                                              thread_name_prefix="answer-writer-shard")
+                list(self._shard_executor.map(lambda codes: self._flush_games(codes, by_game), by_shard.values()))
+            else:
+                self._flush_games(list(by_game), by_game)
+
+    def _flush_games(self, codes: List[str], by_game: Dict[str, List[_PendingAnswer]]) -> None:
+        for code in codes:
+            items = by_game[code]
+            try:
+                self._flush_game(code, items)
+            except Exception as e:
+                logger.error(f"Answer batch failed for game {code}: {e}")
+                with self._lock:
+                    self._metrics['errors'] += len(items)
+                for item in items:
+                    if not item.future.done():
+                        item.future.set_exception(e)
+
+    def _flush_game(self, code: str, items: List[_PendingAnswer]) -> None:
+        game = Game.get_by_code(code)
+        if not game:
+            self._resolve(items, {}, {})
+            return
+
+        accepted, prior, state_version = self._write_batch(game, items)
+        if accepted:
+            game._apply_answers(accepted, state_version)
+        self._resolve(items, accepted, prior)
+
+    @retry_db_operation()
+    def _write_batch(self, game, items: List[_PendingAnswer]):
+        """Grava as respostas válidas do lote numa transação.
+        Retorna ({nickname: resposta}, {(nickname, pergunta): resultado já gravado}, novo state_version ou None)"""
+        def select(q_idx: int, prior: Dict[tuple, tuple]) -> Dict[str, AnswerRecord]:
+            # Dentro da transação do store: respostas repetidas recebem o resultado já gravado
+            accepted: Dict[str, AnswerRecord] = {}
+            for item in items:
+                if (item.question != q_idx or (item.nickname, q_idx) in prior or
+                        item.nickname in accepted or not game._can_answer(item.nickname, q_idx)):
+                    continue
+                accepted[item.nickname] = game._score_answer(item.nickname, q_idx, item.answer_index, item.time_taken)
+            return accepted
+
+        return game_store.add_answer_batch(game.code, select)
+
+    def _resolve(self, items: List[_PendingAnswer], accepted: Dict[str, AnswerRecord],
+                 prior: Dict[tuple, tuple]) -> None:
+        written = set()
+        for item in items:
+            answer = accepted.get(item.nickname)
+            # Duplicatas no mesmo lote recebem o resultado da primeira resposta gravada,
+            # mas só a primeira conta como gravada (as demais contam como recusadas)
+            if answer is not None and answer.question == item.question:
+                written.add(item.nickname)
+                item.future.set_result(answer.result())
+            elif (item.nickname, item.question) in prior:
+                item.future.set_result(prior[(item.nickname, item.question)])
+            else:
+                item.future.set_result((None, 0, 0))
+        with self._lock:
+            self._metrics['batches'] += 1
+            self._metrics['answers'] += len(written)
+            self._metrics['rejected'] += len(items) - len(written)
+            self._metrics['max_batch_size'] = max(self._metrics['max_batch_size'], len(items))
+
+answer_writer = AnswerWriter(flush_interval=ANSWER_FLUSH_INTERVAL)
+
+# ==================== GAME ACTORS ====================
+# Modo actor (opcional, só com um processo): cada jogo com tráfego tem um único dono
+ACTOR_MODE_ENABLED = _get_secret("ARYROOT_ACTOR_MODE", "0").strip().lower() in ("1", "true", "yes")
+if ACTOR_MODE_ENABLED and MULTI_PROCESS:
+    logger.warning("ARYROOT_ACTOR_MODE requires a single process; disabled because ARYROOT_MULTI_PROCESS=1")
+    ACTOR_MODE_ENABLED = False
+
+class _ActorCommand:
+    __slots__ = ("kind", "args", "future")
+
+    def __init__(self, kind: str, args: tuple):
+        self.kind = kind
+        self.args = args
+        self.future = Future()
+
+class GameActor:
+    """Dono único de um jogo: uma thread com fila de comandos.
+
+    Entradas, respostas e mudanças de estado são aplicadas em sequência sobre
+    um Game privado, sem recarregar do cache/banco nem travar. Cada lote da fila
+    é gravado numa única transação antes de qualquer confirmação (write-ahead:
+    nada é visível ou confirmado antes de durável) e então um snapshot
+    copy-on-write é publicado para os leitores.
+    """
+
+    def __init__(self, game: Game, registry: "GameActorRegistry", idle_timeout: float = 300.0,
+                 max_batch: int = 2000):
+        self.code = game.code
+        self._state = game
+        self._state.get_leaderboard()
+        self._state._get_question_stats()
+        self._registry = registry
+        self.idle_timeout = idle_timeout
+        self.max_batch = max_batch
+        self._queue: List[_ActorCommand] = []
+        self._lock = threading.RLock()
+        self._not_empty = threading.Condition(self._lock)
+        self._stopped = False
+        self.snapshot = game._snapshot()
+        self._thread = threading.Thread(target=self._run, name=f"game-actor-{self.code}", daemon=True)
+        self._thread.start()
+
+    def submit(self, kind: str, *args) -> Future:
+        """Enfileira um comando; o Future resolve para (resultado, snapshot publicado)"""
+        command = _ActorCommand(kind, args)
+        with self._lock:
+            if self._stopped:
+                raise RuntimeError(f"Actor for game {self.code} stopped")
+            self._queue.append(command)
+            self._not_empty.notify()
+        return command.future
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                if not self._queue:
+                    self._not_empty.wait(self.idle_timeout)
+                if not self._queue:
+                    # Ocioso: libera a thread; o próximo comando cria outro actor a partir do banco
+                    self._stopped = True
+                    break
+                batch = self._queue[:self.max_batch]
+                del self._queue[:self.max_batch]
+            self._process(batch)
+        self._registry._discard(self)
+
+    def _process(self, batch: List[_ActorCommand]) -> None:
+        game = self._state
+        players: List[Tuple[str, PlayerSnapshot]] = []
+        answers: List[Tuple[str, AnswerRecord]] = []
+        results: List[Any] = []
+        row_changed = False
+
+        for command in batch:
+            try:
+                if command.kind == "join":
+                    result, row = self._join(*command.args)
+                    if row:
+                        players.append(row)
+                elif command.kind == "answer":
+                    result, row = self._answer(*command.args)
+                    if row:
+                        answers.append(row)
+                else:
+                    operation, apply, unchanged = command.args
+                    result = apply(game)
+                    if result is not unchanged:
+                        row_changed = True
+                        game_write_stats.record(operation)
+                results.append((command, result, None))
+            except Exception as e:
+                results.append((command, None, e))
+
+        if players or answers or row_changed:
+            try:
+                state_version = self._persist(players, answers, row_changed)
+            except Exception as e:
+                logger.error(f"Game actor {self.code} failed to persist batch: {e}")
+                # Estado em memória divergiu do banco: recarrega e falha o lote inteiro
+                self._state = Game._load_by_code(self.code) or game
+                self._state.get_leaderboard()
+                self._state._get_question_stats()
+                self.snapshot = self._state._snapshot()
+                game_cache.delete(f"game:{self.code}")
+                self._registry._record(len(batch), errors=len(batch))
+                for command, _, _ in results:
+                    command.future.set_exception(e)
+                return
+            if row_changed:
+                game.version += 1
+            game.state_version = state_version
+            self.snapshot = game._snapshot()
+            game_cache.set(f"game:{self.code}", self.snapshot, successor=True)
+            game_event_bus.publish(self.code, state_version, game.phase)
+
+        errors = 0
+        for command, result, error in results:
+            if error is not None:
+                errors += 1
+                command.future.set_exception(error)
+            else:
+                command.future.set_result((result, self.snapshot))
+        self._registry._record(len(batch), errors=errors)
+
+    def _join(self, nickname, icon, session_id):
+        game = self._state
+        existing = game.players.get(nickname)
+        if existing is not None:
+            return session_id is not None and existing.session_id == session_id, None
+        if game.status != "waiting":
+            return False, None
+        player = PlayerSnapshot(icon=icon, joined_at=datetime.now().isoformat(), session_id=session_id)
+        game.players[nickname] = player
+        game.get_leaderboard().add_player(nickname, icon)
+        return True, (nickname, player)
+
+    def _answer(self, nickname, q_idx, answer_index, time_taken):
+        game = self._state
+        if q_idx != game.current_question or not game._can_answer(nickname, q_idx):
+            player = game.players.get(nickname)
+            prior = player.answer_for(q_idx) if player else None
+            return prior.result() if prior else (None, 0, 0), None
+        answer = game._score_answer(nickname, q_idx, answer_index, time_taken)
+        game.players[nickname] = game.players[nickname].with_answer(answer)
+        game.get_leaderboard().record_answer(nickname, answer.points, answer.correct)
+        stats = game._get_question_stats()
+        stats[q_idx] = game._stats_entry(stats, q_idx).with_answer(answer)
+        return answer.result(), (nickname, answer)
+
+    @retry_db_operation()
+    def _persist(self, players: List[Tuple[str, PlayerSnapshot]], answers: List[Tuple[str, AnswerRecord]],
+                 row_changed: bool) -> int:
+        """Grava o lote numa transação; retorna o novo state_version"""
+        return game_store.persist_batch(self.code, players, answers,
+                                        self._state.to_dict_for_db() if row_changed else None)
+
+class GameActorRegistry:
+    """Actors por código de jogo, criados sob demanda e encerrados quando ociosos"""
+
+    def __init__(self, idle_timeout: float = 300.0):
+        self.idle_timeout = idle_timeout
+        self._actors: Dict[str, GameActor] = {}
+        self._lock = threading.RLock()
+        self._metrics = {'started': 0, 'commands': 0, 'batches': 0, 'errors': 0, 'max_batch_size': 0}
+
+    def submit(self, code: str, kind: str, *args) -> Optional[Future]:
+        """Envia um comando ao actor do jogo; None se o jogo não existe"""
+        for _ in range(3):
+            actor = self._get(code)
+            if actor is None:
+                return None
+            try:
+                return actor.submit(kind, *args)
+            except RuntimeError:
+                # Encerrou por ociosidade entre o _get e o submit
+                self._discard(actor)
+        raise RuntimeError(f"Could not reach actor for game {code}")
+
+    def _get(self, code: str) -> Optional[GameActor]:
+        with self._lock:
+            actor = self._actors.get(code)
+            if actor is not None:
+                return actor
+            game = Game._load_by_code(code)
+            if game is None:
+                return None
+            actor = GameActor(game, self, self.idle_timeout)
+            self._actors[code] = actor
+            self._metrics['started'] += 1
+            return actor
+
+    def snapshot(self, code: str) -> Optional[Game]:
+        """Último snapshot publicado, sem criar actor"""
+        with self._lock:
+            actor = self._actors.get(code)
+        return actor.snapshot if actor is not None else None
+
+    def get_metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics['active_actors'] = len(self._actors)
+        metrics['avg_batch_size'] = round(metrics['commands'] / metrics['batches'], 2) if metrics['batches'] else 0.0
+        return metrics
+
+    def _record(self, commands: int, errors: int = 0) -> None:
+        with self._lock:
+            self._metrics['commands'] += commands
+            self._metrics['batches'] += 1
+            self._metrics['errors'] += errors
+            self._metrics['max_batch_size'] = max(self._metrics['max_batch_size'], commands)
+
+    def _discard(self, actor: GameActor) -> None:
+        with self._lock:
+            if self._actors.get(actor.code) is actor:
+                del self._actors[actor.code]
+
+game_actors = GameActorRegistry()
+
+# ==================== QUESTION SCHEDULER ====================
+QUESTION_SCHEDULER_ENABLED = _get_secret("ARYROOT_QUESTION_SCHEDULER", "1").strip().lower() in ("1", "true", "yes")
+# Folga após o prazo para respostas que chegaram a tempo ainda na fila do answer_writer
+QUESTION_CLOSE_GRACE_MS = int(_get_secret("ARYROOT_CLOSE_GRACE_MS", "250"))
+# > 0: depois de fechar, avança sozinho para a próxima pergunta após esse intervalo de revelação
+AUTO_ADVANCE_SECONDS = float(_get_secret("ARYROOT_AUTO_ADVANCE_S", "0"))
+
+class QuestionScheduler:
+    """Fecha perguntas no prazo sem depender do navegador de ninguém.
+
+    Uma única thread por processo espera pelo próximo prazo de um heap de
+    (instante monotônico, ação, jogo, pergunta). No prazo, close_question marca a
+    pergunta como fechada (compare-and-swap: entre processos só um vence),
+    congela as estatísticas e publica no game_event_bus. Com auto_advance_seconds,
+    agenda também o next_question depois do intervalo de revelação.
+    """
+
+    def __init__(self, grace_ms: int = 250, auto_advance_seconds: float = 0.0, enabled: bool = True):
+        self.grace_ms = grace_ms
+        self.auto_advance_seconds = auto_advance_seconds
+        self.enabled = enabled
+        self._heap: List[tuple] = []
+        self._keys: set = set()
+        self._lock = threading.RLock()
+        self._wakeup = threading.Condition(self._lock)
+        self._thread = None
+        self._metrics = {'scheduled': 0, 'closed': 0, 'advanced': 0, 'skipped': 0, 'errors': 0, 'max_lag_ms': 0}
+
+    def schedule_close(self, game: Optional[Game]) -> bool:
+        """Agenda o fechamento da pergunta atual de game (idempotente por jogo/pergunta)"""
+        if game is None or game.question_start_ms is None or not game.is_open(game.current_question):
+            return False
+        return self._schedule("close", game.code, game.current_question, game.remaining_ms() + self.grace_ms)
+
+    def resume(self, game: Optional[Game]) -> bool:
+        """Reagenda o que um jogo carregado do banco ainda espera (ex.: após reinício):
+        o fechamento da pergunta aberta ou, se ela já fechou, o auto-avanço, contado
+        a partir do prazo gravado (question_deadline_ms)"""
+        if game is None or game.status != "active" or game.question_start_ms is None:
+            return False
+        if not game.question_closed:
+            return self.schedule_close(game)
+        if self.auto_advance_seconds <= 0 or game.question_deadline_ms is None:
+            return False
+        overdue_ms = game.elapsed_ms() - (game.question_deadline_ms - game.question_start_ms)
+        delay_ms = max(0, self.grace_ms + self.auto_advance_seconds * 1000 - overdue_ms)
+        return self._schedule("advance", game.code, game.current_question, delay_ms)
+
+    def _schedule(self, action: str, code: str, q_idx: int, delay_ms: float) -> bool:
+        if not self.enabled:
+            return False
+        key = (action, code, q_idx)
+        with self._lock:
+            if key in self._keys:
+                return False
+            self._keys.add(key)
+            heapq.heappush(self._heap, (time.monotonic() + delay_ms / 1000.0, key))
+            self._metrics['scheduled'] += 1
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="question-scheduler", daemon=True)
+                self._thread.start()
+            self._wakeup.notify()
+        return True
+
+    def get_metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics['pending'] = len(self._heap)
+        metrics['enabled'] = self.enabled
+        metrics['auto_advance_seconds'] = self.auto_advance_seconds
+        return metrics
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                while True:
+                    if not self._heap:
+                        self._wakeup.wait()
+                        continue
+                    due, key = self._heap[0]
+                    wait = due - time.monotonic()
+                    if wait <= 0:
+                        break
+                    # Acorda antes se um prazo mais cedo for agendado
+                    self._wakeup.wait(wait)
+                heapq.heappop(self._heap)
+                self._keys.discard(key)
+                lag_ms = int((time.monotonic() - due) * 1000)
+                self._metrics['max_lag_ms'] = max(self._metrics['max_lag_ms'], lag_ms)
+            try:
+                self._fire(*key)
+            except Exception as e:
+                logger.error(f"Question scheduler failed to {key[0]} {key[1]} Q{key[2]}: {e}")
+                self._count('errors')
+
+    def _fire(self, action: str, code: str, q_idx: int) -> None:
+        game = Game.get_by_code(code)
+        if game is None or not (game.is_open(q_idx) if action == "close" else
+                                game.status == "active" and game.current_question == q_idx):
+            self._count('skipped')
+            return
+
+        if action == "close":
+            if not game.is_expired():
+                # Agendado por outro relógio (ou prazo ainda não atingido): tenta de novo no prazo
+                self._schedule("close", code, q_idx, game.remaining_ms() + self.grace_ms)
+                return
+            if not game.close_question(q_idx):
+                self._count('skipped')
+                return
+            self._count('closed')
+            if self.auto_advance_seconds > 0:
+                self._schedule("advance", code, q_idx, self.auto_advance_seconds * 1000)
+        elif action == "advance":
+            if game.next_question(expected_q=q_idx) is None:
+                self._count('skipped')
+                return
+            self._count('advanced')
+
+    def _count(self, metric: str) -> None:
+        with self._lock:
+            self._metrics[metric] += 1
+
+question_scheduler = QuestionScheduler(QUESTION_CLOSE_GRACE_MS, AUTO_ADVANCE_SECONDS, QUESTION_SCHEDULER_ENABLED)
+
+# Vários processos no mesmo banco: hits de cache são revalidados por data_version/versão
+# (nunca com o backend em memória, que não tem banco para consultar)
+if MULTI_PROCESS and STORAGE_BACKEND == "sqlite":
+    game_cache.validator = Game.find_stale_cached
+    teacher_cache.validator = Teacher.find_stale_cached
 
 # Sample questions
 SAMPLE_QUESTIONS = [
@@ -1,13 +1,14 @@
 # professor.py - FIXED VERSION
 import streamlit as st
-from core import Teacher, Game, generate_game_code, SAMPLE_QUESTIONS
+from core import (Teacher, Game, MemoryCache, MULTI_PROCESS, AUTO_ADVANCE_SECONDS, generate_game_code, SAMPLE_QUESTIONS,
+                  TEACHER_REFRESH_SECONDS)
+from ui import memo_by_version, build_players_grid_html
 import bcrypt
 import json
 import html as html_module
 import random
 import time
 import threading
-from datetime import datetime
 from typing import Optional, Any, Dict
 import logging
 
@@ -15,33 +16,26 @@ logger = logging.getLogger(__name__)
 
 # ==================== THREAD-SAFE LOCAL CACHE ====================
 class ThreadSafeProfessorCache:
-    """Cache local thread-safe para professores - FIXED"""
+    """Cache local thread-safe para professores (LRU com TTL de 5 minutos)"""
     
-    def __init__(self):
-        self._cache: Dict[str, Dict[str, Any]] = {}
-        self._lock = threading.RLock()
+    def __init__(self, ttl: int = 300, max_entries: int = 500):
+        self._cache = MemoryCache(default_ttl=ttl, max_entries=max_entries, name="professor_local",
+                                  validator=Teacher.find_stale_cached if MULTI_PROCESS else None)
     
     def get(self, username: str) -> Optional[Teacher]:
-        with self._lock:
-            cached_data = self._cache.get(username)
-            if cached_data and (datetime.now() - cached_data['timestamp']).total_seconds() < 300:
-                return cached_data['teacher']
-        return None
+        return self._cache.get(username)
     
     def set(self, teacher: Teacher):
-        with self._lock:
-            self._cache[teacher.username] = {
-                'teacher': teacher,
-                'timestamp': datetime.now()
-            }
+        self._cache.set(teacher.username, teacher)
     
     def delete(self, username: str):
-        with self._lock:
-            self._cache.pop(username, None)
+        self._cache.delete(username)
     
     def clear(self):
-        with self._lock:
-            self._cache.clear()
+        self._cache.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return self._cache.get_stats()
 
 # Instância global thread-safe
 professor_local_cache = ThreadSafeProfessorCache()
@@ -293,7 +287,7 @@ def render_teacher_dashboard():
     if active_games:
         st.subheader("🎮 Jogos ativos")
         for game_obj in active_games:
-            player_count = len(game_obj.players) if hasattr(game_obj, 'players') and game_obj.players else 0
+            player_count = len(game_obj.players)
             status_emoji = "⏳" if game_obj.status == "waiting" else "🟢"
             
             if st.button(
@@ -935,7 +929,7 @@ def render_teacher_game_control():
     </script>
     """, height=0)
     with st.sidebar:
-        render_current_ranking(current_game)
+        render_current_ranking_live(current_game.code)
 
     st.markdown("<h1 class='title' style='font-size:2rem; margin-top:-2rem;'>🎮 Controle do Jogo</h1>", unsafe_allow_html=True)
 
@@ -960,11 +954,6 @@ def render_teacher_game_control():
     # Informações do jogo
     render_game_info(current_game)
 
-    # Auto-refresh para jogos ativos
-    if current_game and current_game.status in ["waiting", "active"]:
-        time.sleep(2)
-        st.rerun()
-
 def render_game_control_actions(current_game):
     """Renderiza ações de controle do jogo"""
     if current_game.status == "waiting":
@@ -992,8 +981,7 @@ def render_game_control_actions(current_game):
         col1, col2 = st.columns(2)
         with col1:
             if st.button("▶️ Iniciar jogo", disabled=not can_start, use_container_width=True, type="primary"):
-                current_game.time_limit = st.session_state.get("selected_time_limit", 20)
-                start_game_operation(current_game)
+                start_game_operation(current_game, st.session_state.get("selected_time_limit", 20))
         with col2:
             if st.button("⏹️ Finalizar Jogo", use_container_width=True):
                 finish_game_operation(current_game)
@@ -1012,10 +1000,10 @@ def render_game_control_actions(current_game):
             navigate_to("game_results")
             st.rerun()
 
-def start_game_operation(game):
+def start_game_operation(game, time_limit):
     """Inicia o jogo com time_limit configurado"""
     def start_operation():
-        game.start_game()
+        game.start_game(time_limit)
         return True
 
     with st.spinner("Iniciando jogo..."):
@@ -1029,12 +1017,15 @@ def start_game_operation(game):
 def next_question_operation(game):
     """Avança para próxima pergunta"""
     def next_operation():
-        return game.next_question()
+        # Pergunta exibida: se o jogo já avançou (outro clique/auto-avanço), não pula
+        return game.next_question(expected_q=game.current_question)
     
     with st.spinner("Carregando próxima pergunta..."):
         result = resilient_teacher_operation(next_operation)
     
-    if result.success and result.data is not None:
+    if result.success and result.data is None:
+        st.rerun()
+    elif result.success:
         if result.data:
             st.session_state.show_ranking = True
             st.rerun()
@@ -1047,8 +1038,7 @@ def next_question_operation(game):
 def finish_game_operation(game):
     """Finaliza o jogo"""
     def finish_operation():
-        game.status = "finished"
-        game.save()
+        game.finish_game()
         return True
     
     with st.spinner("Finalizando jogo..."):
@@ -1063,13 +1053,22 @@ def finish_game_operation(game):
 def render_game_info(current_game):
     """Renderiza informações do jogo"""
     if current_game.status == "waiting":
-        render_waiting_players(current_game)
+        render_waiting_players_live(current_game.code, bool(current_game.players))
     elif current_game.status == "active":
         render_current_question(current_game)
     elif current_game.status == "finished":
         st.success("🎉 Jogo finalizado!")
         st.markdown("Os resultados finais podem ser visualizados na página de resultados.")
 
+@st.fragment(run_every=TEACHER_REFRESH_SECONDS)
+def render_waiting_players_live(game_code, had_players):
+    """Jogadores da sala com auto-refresh próprio; rerun completo quando o jogo
+    sai de 'waiting' ou entra o primeiro jogador (habilita "Iniciar jogo")"""
+    game = Game.get_by_code(game_code)
+    if not game or game.status != "waiting" or bool(game.players) != had_players:
+        st.rerun()
+    render_waiting_players(game)
+
 def render_waiting_players(game):
     """Renderiza lista de jogadores esperando"""
     st.markdown("<h3 style='text-align:center;'>Jogadores na sala:</h3>", unsafe_allow_html=True)
@@ -1077,19 +1076,11 @@ def render_waiting_players(game):
     if not game.players:
         st.info("Nenhum jogador entrou.")
     else:
-        player_cols = st.columns(3)
-        players_list = list(game.players.items())
-        
-        for i, (player_name, player_data) in enumerate(players_list):
-            with player_cols[i % 3]:
-                icon = player_data.get('icon', '❓') if isinstance(player_data, dict) else '❓'
-                safe_name = html_module.escape(player_name)
-                st.markdown(
-                    f"<div style='text-align:center; padding:10px; margin:5px; "
-                    f"background-color:#e0f7fa; border-radius:10px;'>"
-                    f"<span style='font-size:2rem;'>{icon}</span><br>{safe_name}</div>",
-                    unsafe_allow_html=True
-                )
+        st.markdown(
+            memo_by_version(f"waiting_players:{game.code}", game.state_version,
+                            lambda: build_players_grid_html(game.players)),
+            unsafe_allow_html=True
+        )
 
 def render_current_question(game):
     """Renderiza pergunta atual com timer e revelação condicional"""
@@ -1104,33 +1095,13 @@ def render_current_question(game):
     q_data = game.questions[q_idx]
     st.markdown(f"<p style='font-size:1.05rem;font-weight:bold;'>{q_data['question']}</p>", unsafe_allow_html=True)
 
-    # Contador de respostas
-    total_players = len(game.players)
-    answered_count = sum(
-        1 for player_data in game.players.values()
-        if isinstance(player_data, dict) and
-        any(ans.get('question') == q_idx for ans in player_data.get('answers', []))
-    )
-
     # Timer do professor (item 9)
     time_limit = game.time_limit
-    q_start = game.question_start_time
-    elapsed_s = 0
-    if q_start:
-        try:
-            from datetime import datetime as dt
-            elapsed_s = (dt.now() - dt.fromisoformat(q_start)).total_seconds()
-        except (ValueError, TypeError):
-            elapsed_s = 0
-
-    remaining_s = max(0, time_limit - elapsed_s)
-    all_answered = (answered_count >= total_players and total_players > 0)
-    time_expired = (remaining_s <= 0)
-    reveal_answer = all_answered or time_expired
+    remaining_s = game.remaining_ms() / 1000
 
     # Timer visual
-    elapsed_ms = int(elapsed_s * 1000)
     limit_ms = time_limit * 1000
+    elapsed_ms = limit_ms - game.remaining_ms()
     timer_html = f"""
     <div style="text-align:center;margin:8px 0;">
         <span id="prof-timer" style="font-size:1.2rem;font-weight:bold;color:#4CAF50;">⏱ {int(remaining_s)}s</span>
@@ -1166,34 +1137,82 @@ def render_current_question(game):
     """
     st_html(timer_html, height=50)
 
+    # Contador e revelação mudam com as respostas: só esse trecho se atualiza
+    render_question_progress_live(game.code, q_idx)
+
+@st.fragment(run_every=TEACHER_REFRESH_SECONDS)
+def render_question_progress_live(game_code, q_idx):
+    """Contador de respostas e opções (com a correta revelada no fim)"""
+    game = Game.get_by_code(game_code)
+    if not game or game.status != "active" or game.current_question != q_idx:
+        st.rerun()
+    q_data = game.questions[q_idx]
+
+    # Agregados da pergunta mantidos a cada resposta gravada: O(1) por refresh
+    total_players = len(game.players)
+    stats = game.question_stats(q_idx)
+    answered_count = stats.answered
+
+    all_answered = (answered_count >= total_players and total_players > 0)
+    time_expired = game.question_closed or game.is_expired()
+    reveal_answer = all_answered or time_expired
+
     st.info(f"📊 {answered_count}/{total_players} jogadores responderam")
+    if game.question_closed and AUTO_ADVANCE_SECONDS > 0:
+        st.caption(f"⏭ Próxima pergunta automática em até {AUTO_ADVANCE_SECONDS:g}s")
 
-    # Opções (item 8: só revelar correta quando tempo acabar ou todos responderem)
+    # Opções com a distribuição das respostas (item 8: só revelar correta quando tempo acabar ou todos responderem)
     st.write("**Opções:**")
+    st.markdown(
+        memo_by_version(f"answer_distribution:{game.code}:{q_idx}:{reveal_answer}", game.state_version,
+                        lambda: build_answer_distribution_html(q_data, stats, reveal_answer)),
+        unsafe_allow_html=True
+    )
+
+def build_answer_distribution_html(q_data, stats, reveal_answer):
+    """Uma barra por opção com quantas respostas recebeu (um único bloco HTML)"""
+    rows = []
     for i, opt in enumerate(q_data["options"]):
-        is_correct = i == q_data['correct']
-        if reveal_answer and is_correct:
-            st.markdown(
-                f"<span style='color:green;font-weight:bold;'>✓ {i+1}. {opt} (Correta)</span>",
-                unsafe_allow_html=True
-            )
-        else:
-            st.markdown(f"{i+1}. {opt}")
+        count = stats.option_counts[i] if i < len(stats.option_counts) else 0
+        pct = count / stats.answered * 100 if stats.answered else 0
+        is_correct = reveal_answer and i == q_data['correct']
+        label = f"✓ {i+1}. {html_module.escape(str(opt))} (Correta)" if is_correct else f"{i+1}. {html_module.escape(str(opt))}"
+        color = '#4CAF50' if is_correct else '#90A4AE'
+        rows.append(
+            f"<div style='margin-bottom:6px;'>"
+            f"<div style='display:flex;justify-content:space-between;"
+            f"{'color:green;font-weight:bold;' if is_correct else ''}'>"
+            f"<span>{label}</span><span>{count}</span></div>"
+            f"<div style='background:#e0e0e0;border-radius:6px;height:8px;'>"
+            f"<div style='background:{color};width:{pct:.0f}%;height:8px;border-radius:6px;'></div></div></div>"
+        )
+    if stats.median_time_ms is not None:
+        rows.append(
+            f"<div style='font-size:0.85rem;color:#666;'>⏱ Tempo médio {stats.mean_time_ms / 1000:.1f}s · "
+            f"mediana {stats.median_time_ms / 1000:.1f}s"
+            + (f" · {stats.correct}/{stats.answered} acertos" if reveal_answer else "") + "</div>"
+        )
+    return "".join(rows)
+
+@st.fragment(run_every=TEACHER_REFRESH_SECONDS)
+def render_current_ranking_live(game_code):
+    """Ranking do sidebar com auto-refresh próprio"""
+    game = Game.get_by_code(game_code)
+    if game:
+        render_current_ranking(game)
 
 def render_current_ranking(game):
     """Renderiza ranking atual"""
     st.subheader("🏆 Ranking atual")
     
     def get_ranking():
-        return game.get_ranking()
-    
-    result = resilient_teacher_operation(get_ranking)
-    ranking_data = result.data if result.success else []
+        return game.get_ranking(10)
     
-    if not ranking_data:
-        st.info("Nenhum jogador pontuou ainda.")
-    else:
-        for i, player_info in enumerate(ranking_data[:10]):
+    def build_ranking_html():
+        result = resilient_teacher_operation(get_ranking)
+        ranking_data = result.data if result.success else []
+        rows = []
+        for i, player_info in enumerate(ranking_data):
             medal = ["🥇", "🥈", "🥉"][i] if i < 3 else f"{i+1}."
             
             # Cores do ranking
@@ -1210,7 +1229,7 @@ def render_current_ranking(game):
             name = html_module.escape(player_info.get('name', 'Unknown'))
             score = player_info.get('score', 0)
 
-            st.markdown(
+            rows.append(
                 f"""<div style='display:flex;align-items:center;padding:8px;margin-bottom:5px;
                 background-color:{bg};border-radius:8px;border:1px solid {border};
                 box-shadow:0 2px 4px rgba(0,0,0,0.05);'>
@@ -1218,6 +1237,12 @@ def render_current_ranking(game):
                 <span style='font-size:1.6rem;margin-right:10px;'>{icon}</span>
                 <span style='flex-grow:1;font-weight:500;color:#333;'>{name}</span>
                 <span style='font-weight:bold;color:#007bff;'>{score} pts</span>
-                </div>""",
-                unsafe_allow_html=True
-            )
\ No newline at end of file
+                </div>"""
+            )
+        return "".join(rows)
+    
+    ranking_html = memo_by_version(f"ranking:{game.code}", game.state_version, build_ranking_html)
+    if not ranking_html:
+        st.info("Nenhum jogador pontuou ainda.")
+    else:
+        st.markdown(ranking_html, unsafe_allow_html=True)
\ No newline at end of file
@@ -0,0 +1,28 @@
+# ui.py - Helpers de renderização compartilhados pelas páginas do aluno e do professor
+import streamlit as st
+import html as html_module
+
+# ==================== RENDER MEMO (STATE VERSION) ====================
+def memo_by_version(key, version, builder):
+    """Reaproveita o resultado de builder() enquanto o state_version do jogo não muda"""
+    memo = st.session_state.setdefault("_render_memo", {})
+    cached = memo.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    value = builder()
+    memo[key] = (version, value)
+    return value
+
+# ==================== PLAYERS GRID ====================
+def build_players_grid_html(players):
+    """Grade de 3 colunas com os jogadores da sala (um único bloco HTML)"""
+    cards = []
+    for player_name, player in players.items():
+        icon = player.icon or '❓'
+        safe_name = html_module.escape(player_name)
+        cards.append(
+            f"<div style='text-align:center; padding:10px; margin:5px; "
+            f"background-color:#e0f7fa; border-radius:10px;'>"
+            f"<span style='font-size:2rem;'>{icon}</span><br>{safe_name}</div>"
+        )
+    return "<div style='display:grid; grid-template-columns:repeat(3, 1fr);'>" + "".join(cards) + "</div>"